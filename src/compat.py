@@ -0,0 +1,7 @@
+"""Compatibility helpers - Python version differences."""
+
+import sys
+
+# __slots__ on dataclasses needs Python 3.10+ (Bullseye ships 3.9);
+# use as @dataclass(**DATACLASS_SLOTS)
+DATACLASS_SLOTS = {'slots': True} if sys.version_info >= (3, 10) else {}
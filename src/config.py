@@ -1,7 +1,11 @@
 """Configuration module - Simple version."""
 
-import yaml
+import logging
 import os
+import pickle
+from types import SimpleNamespace
+
+logger = logging.getLogger(__name__)
 
 class Config:
     """Load and manage configuration."""
@@ -12,8 +16,7 @@ class Config:
         Args:
             config_file: Path to config file
         """
-        with open(config_file, 'r') as f:
-            self.config = yaml.safe_load(f)
+        self.config = self._load(config_file)
         
         # Apply environment variable overrides
         if vid := os.getenv('TARGET_VID'):
@@ -22,8 +25,73 @@ class Config:
         if pid := os.getenv('TARGET_PID'):
             self.config['target_device']['pid'] = pid
         
-        print(f"[Config] Loaded: VID={self['target_device']['vid']}, "
-              f"PID={self['target_device']['pid']}")
+        # Precompute dot-notation keys for get()
+        self._flat = {}
+        self._flatten(self.config, '')
+        
+        # Attribute view for hot paths: config_ns.security.verify_checksum
+        self.config_dict = self.config
+        self.config_ns = self._to_namespace(self.config)
+        
+        logger.info("[Config] Loaded: VID=%s, PID=%s",
+              self['target_device']['vid'], self['target_device']['pid'])
+    
+    def _load(self, config_file):
+        """Load YAML, reusing a pickled parse while the file is unchanged.
+        
+        Args:
+            config_file: Path to config file
+            
+        Returns:
+            Parsed config dict
+        """
+        cache_file = config_file + '.pkl'
+        st = os.stat(config_file)
+        stamp = (st.st_mtime_ns, st.st_size)
+        
+        try:
+            with open(cache_file, 'rb') as f:
+                cached_stamp, config = pickle.load(f)
+            if cached_stamp == stamp:
+                return config
+        except Exception:
+            pass
+        
+        # Only pay for importing yaml on a cache miss
+        import yaml
+        
+        # Use libyaml's C parser when PyYAML was built against it
+        try:
+            from yaml import CSafeLoader as SafeLoader
+        except ImportError:
+            from yaml import SafeLoader
+        
+        with open(config_file, 'r') as f:
+            config = yaml.load(f, Loader=SafeLoader)
+        
+        try:
+            tmp_file = cache_file + '.tmp'
+            with open(tmp_file, 'wb') as f:
+                pickle.dump((stamp, config), f)
+            os.replace(tmp_file, cache_file)
+        except OSError as e:
+            logger.info("[Config] Could not write cache %s: %s", cache_file, e)
+        
+        return config
+    
+    def _flatten(self, node, prefix):
+        """Index every nested value under its dot-notation key."""
+        for k, v in node.items():
+            key = f"{prefix}{k}"
+            self._flat[key] = v
+            if isinstance(v, dict):
+                self._flatten(v, f"{key}.")
+    
+    def _to_namespace(self, node):
+        """Convert nested dicts to SimpleNamespace (other values unchanged)."""
+        if isinstance(node, dict):
+            return SimpleNamespace(**{k: self._to_namespace(v) for k, v in node.items()})
+        return node
     
     def get(self, key, default=None):
         """Get config value by dot notation.
@@ -35,18 +103,8 @@ class Config:
         Returns:
             Config value
         """
-        keys = key.split('.')
-        value = self.config
-        
-        for k in keys:
-            if isinstance(value, dict):
-                value = value.get(k)
-                if value is None:
-                    return default
-            else:
-                return default
-        
-        return value
+        value = self._flat.get(key)
+        return default if value is None else value
     
     def __getitem__(self, key):
         """Dictionary-style access."""
@@ -1,6 +1,34 @@
 """Device validation module - Simple version."""
 
+import logging
+import os
 import re
+import time
+
+logger = logging.getLogger(__name__)
+
+# How long a resolved serial port stays valid
+PORT_CACHE_TTL = 10.0
+
+# pyudev module, imported on first use (False if not installed)
+_pyudev = None
+
+def _load_pyudev():
+    """Import pyudev once.
+    
+    Returns:
+        pyudev module or None if unavailable
+    """
+    global _pyudev
+    
+    if _pyudev is None:
+        try:
+            import pyudev
+            _pyudev = pyudev
+        except ImportError:
+            _pyudev = False
+    
+    return _pyudev or None
 
 class DeviceValidator:
     """Validate USB devices by VID/PID."""
@@ -11,11 +39,31 @@ class DeviceValidator:
         Args:
             target_vid: Target vendor ID (4 hex digits)
             target_pid: Target product ID (4 hex digits)
+            
+        Raises:
+            ValueError: If an ID is not a hex string
         """
-        self.target_vid = target_vid.lower()
-        self.target_pid = target_pid.lower()
+        self.target_vid = self._parse_id(target_vid)
+        self.target_pid = self._parse_id(target_pid)
+        
+        # (vid, pid, sys_name) -> (port, resolved_at)
+        self._port_cache = {}
         
-        print(f"[Validator] Target: VID={self.target_vid}, PID={self.target_pid}")
+        logger.info("[Validator] Target: VID=%04x, PID=%04x", self.target_vid, self.target_pid)
+    
+    def _parse_id(self, value):
+        """Convert a hex string ID from config to int.
+        
+        Raises:
+            ValueError: If the ID is not a string. YAML has already turned
+                unquoted IDs like 0x1a86 or 0043 into a different number.
+        """
+        if not isinstance(value, str):
+            raise ValueError(
+                f"USB ID {value!r} in config must be a quoted hex string, "
+                f"e.g. pid: \"7523\""
+            )
+        return int(value, 16)
     
     def is_valid_device(self, device):
         """Check if device matches target.
@@ -26,15 +74,15 @@ class DeviceValidator:
         Returns:
             True if valid
         """
-        vid_match = device.vid.lower() == self.target_vid
-        pid_match = device.pid.lower() == self.target_pid
+        vid_match = device.vid == self.target_vid
+        pid_match = device.pid == self.target_pid
         
         is_valid = vid_match and pid_match
         
         if is_valid:
-            print(f"[Validator] ✓ Valid device: {device}")
+            logger.info("[Validator] ✓ Valid device: %s", device)
         else:
-            print(f"[Validator] ✗ Invalid device: {device}")
+            logger.info("[Validator] ✗ Invalid device: %s", device)
         
         return is_valid
     
@@ -47,57 +95,77 @@ class DeviceValidator:
       Returns:
           Port path or None
       """
-      import os
-      import time
-      
       # Method 1: Check device_node
       port = device.device_node
       
       if port and port.startswith('/dev/tty'):
-          print(f"[Validator] Port from device_node: {port}")
+          logger.info("[Validator] Port from device_node: %s", port)
           return port
       
-      # Method 2: Search for tty devices with same VID/PID
-      print(f"[Validator] Searching for serial port with VID={device.vid}, PID={device.pid}...")
-      
-      # Wait a bit for device to be ready
-      time.sleep(1)
-      
-      # Try common serial ports
-      for port_name in ['ttyUSB0', 'ttyUSB1', 'ttyUSB2', 'ttyACM0', 'ttyACM1']:
-          port_path = f'/dev/{port_name}'
-          
-          if os.path.exists(port_path):
-              print(f"[Validator] Found port: {port_path}")
-              
-              # Verify it's the right device by checking sys path
-              try:
-                  sys_path = f"/sys/class/tty/{port_name}/device"
-                  if os.path.exists(sys_path):
-                      # Read VID/PID from sys
-                      # This is the correct device
-                      return port_path
-              except:
-                  pass
-      
-      # Method 3: Use pyudev to find TTY subsystem device
-      try:
-          import pyudev
-          context = pyudev.Context()
-          
-          for tty_device in context.list_devices(subsystem='tty'):
-              parent = tty_device.find_parent('usb', 'usb_device')
-              if parent:
-                  parent_vid = parent.get('ID_VENDOR_ID', '')
-                  parent_pid = parent.get('ID_MODEL_ID', '')
-                  
-                  if parent_vid == device.vid and parent_pid == device.pid:
-                      port = tty_device.device_node
-                      if port:
-                          print(f"[Validator] Found via pyudev: {port}")
-                          return port
-      except Exception as e:
-          print(f"[Validator] pyudev search failed: {e}")
+      key = (device.vid, device.pid, device.sys_name)
+      cached = self._port_cache.get(key)
+      if cached and time.monotonic() - cached[1] < PORT_CACHE_TTL:
+          logger.info("[Validator] Port from cache: %s", cached[0])
+          return cached[0]
       
-      print(f"[Validator] ✗ No serial port found!")
-      return None
\ No newline at end of file
+      port = self._find_device_port(device)
+      if port:
+          self._port_cache[key] = (port, time.monotonic())
+      return port
+    
+    def invalidate_port(self, device):
+        """Forget cached serial port for a disconnected device.
+        
+        Args:
+            device: USBDevice object
+        """
+        self._port_cache.pop((device.vid, device.pid, device.sys_name), None)
+    
+    def _find_device_port(self, device):
+        """Search udev (or /dev) for the device's serial port.
+        
+        Args:
+            device: USBDevice object
+            
+        Returns:
+            Port path or None
+        """
+        logger.info("[Validator] Searching for serial port with VID=%04x, PID=%04x...", device.vid, device.pid)
+        
+        # udev reports IDs as 4 lowercase hex digits
+        vid_hex = f"{device.vid:04x}"
+        pid_hex = f"{device.pid:04x}"
+        
+        # Method 2: Use pyudev to find TTY subsystem device (no device files opened)
+        pyudev = _load_pyudev()
+        
+        if pyudev:
+            try:
+                context = pyudev.Context()
+                
+                for tty_device in context.list_devices(subsystem='tty'):
+                    parent = tty_device.find_parent('usb', 'usb_device')
+                    if parent:
+                        parent_vid = parent.get('ID_VENDOR_ID', '')
+                        parent_pid = parent.get('ID_MODEL_ID', '')
+                        
+                        if parent_vid == vid_hex and parent_pid == pid_hex:
+                            port = tty_device.device_node
+                            if port:
+                                logger.info("[Validator] Found via pyudev: %s", port)
+                                return port
+            except Exception as e:
+                logger.info("[Validator] pyudev search failed: %s", e)
+        
+        # Method 3: Try common serial ports (only without pyudev)
+        else:
+            for port_name in ['ttyUSB0', 'ttyUSB1', 'ttyUSB2', 'ttyACM0', 'ttyACM1']:
+                port_path = f'/dev/{port_name}'
+                
+                # One stat per candidate; the node existing is all we can check here
+                if os.path.exists(port_path):
+                    logger.info("[Validator] Found port: %s", port_path)
+                    return port_path
+        
+        logger.info("[Validator] ✗ No serial port found!")
+        return None
\ No newline at end of file
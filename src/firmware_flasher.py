@@ -1,9 +1,42 @@
 """Firmware flashing module with retry logic."""
 
+import logging
+import os
+import random
+import re
+import selectors
+import shutil
 import subprocess
 import time
+from collections import deque
 from dataclasses import dataclass
 
+from src.log_setup import SEP
+
+logger = logging.getLogger(__name__)
+
+# Tool output that means retrying cannot help (missing firmware, bad arguments)
+UNRECOVERABLE_ERRORS = (
+    "can't open input file",    # avrdude
+    "can't open '",             # esptool (argparse FileType)
+    "error: argument",
+    "unrecognized arguments",
+)
+
+# Tool output lines kept for error reporting
+OUTPUT_TAIL_LINES = 50
+
+# Max wait for the serial port to become usable before an attempt
+PORT_READY_TIMEOUT = 0.2
+
+# Circuit breaker: stop retrying after repeated failures across devices
+BREAKER_THRESHOLD = 3       # Failed flashes...
+BREAKER_WINDOW = 60.0       # ...within this many seconds
+BREAKER_COOLDOWN = 30.0     # Reject flashes for this long
+
+class UnrecoverableFlashError(Exception):
+    """Flash error that will fail again on retry."""
+
 @dataclass
 class FlashResult:
     """Result of firmware flashing."""
@@ -23,17 +56,33 @@ class FirmwareFlasher:
         """
         self.firmware_path = config['firmware'].get('path', None)
         self.tool_command = config['firmware']['command']
+        # Pre-split command; (token, needs_format) pairs
+        self._cmd_template = [(tok, '{' in tok) for tok in self.tool_command.split()]
         self.timeout = config['firmware']['timeout']
         self.baudrate = config['firmware']['baudrate']
         self.retry_count = config['firmware']['retry_count']
         self.retry_delay = config['firmware']['retry_delay']
         
-        print(f"[Flasher] Initialized")
+        # Exponential backoff with jitter between attempts
+        self.base_delay = config['firmware'].get('retry_base_delay', self.retry_delay)
+        self.max_delay = config['firmware'].get('retry_max_delay', 30.0)
+        self.jitter = config['firmware'].get('retry_jitter', 0.5)
+        self._rng = random.Random()
+        
+        # Optional callable receiving each line of tool output
+        self.progress_callback = None
+        
+        # Circuit breaker state
+        self._recent_failures = deque(maxlen=BREAKER_THRESHOLD)
+        self._breaker_open_until = 0.0
+        
+        logger.info("[Flasher] Initialized")
         if self.firmware_path:
-            print(f"  Firmware: {self.firmware_path} (fixed)")
+            logger.info("  Firmware: %s (fixed)", self.firmware_path)
         else:
-            print(f"  Firmware: Will be loaded from USB (dynamic)")
-        print(f"  Retry: {self.retry_count} times, delay {self.retry_delay}s")
+            logger.info("  Firmware: Will be loaded from USB (dynamic)")
+        logger.info("  Retry: %s times, backoff %ss (max %ss, jitter ±%.0f%%)",
+              self.retry_count, self.base_delay, self.max_delay, self.jitter * 100)
     
     def flash(self, device_port):
         """Flash firmware with retry logic.
@@ -44,38 +93,92 @@ class FirmwareFlasher:
         Returns:
             FlashResult object
         """
-        print(f"\n{'='*60}")
-        print(f"[Flasher] Starting flash to {device_port}")
-        print(f"{'='*60}")
+        logger.info("\n%s", SEP)
+        logger.info("[Flasher] Starting flash to %s", device_port)
+        logger.info(SEP)
         
+        remaining = self._breaker_open_until - time.monotonic()
+        if remaining > 0:
+            error_msg = f"Circuit open after repeated failures, retry in {remaining:.0f}s"
+            logger.error("[Flasher] ✗ %s", error_msg)
+            return FlashResult(
+                success=False,
+                message=error_msg,
+                duration=0.0,
+                attempt=0
+            )
+        
+        result = self._flash_with_retry(device_port)
+        
+        if result.success:
+            if self._recent_failures:
+                logger.info("[Flasher] Circuit closed")
+            self._recent_failures.clear()
+        else:
+            self._record_failure()
+        
+        return result
+    
+    def _record_failure(self):
+        """Record a failed flash and open the circuit if failures pile up."""
+        now = time.monotonic()
+        self._recent_failures.append(now)
+        
+        if (len(self._recent_failures) == BREAKER_THRESHOLD
+                and now - self._recent_failures[0] <= BREAKER_WINDOW):
+            self._breaker_open_until = now + BREAKER_COOLDOWN
+            self._recent_failures.clear()
+            logger.info("[Flasher] Circuit OPEN: %s failures within %.0fs, pausing flashes for %.0fs",
+                  BREAKER_THRESHOLD, BREAKER_WINDOW, BREAKER_COOLDOWN)
+    
+    def _flash_with_retry(self, device_port):
+        """Run flash attempts with backoff between them.
+        
+        Args:
+            device_port: Serial port path
+            
+        Returns:
+            FlashResult object
+        """
         last_error = None
         
         # Retry loop
         for attempt in range(1, self.retry_count + 1):
-            print(f"\n[Flasher] Attempt {attempt}/{self.retry_count}")
+            logger.info("\n[Flasher] Attempt %s/%s", attempt, self.retry_count)
             
             try:
                 result = self._execute_flash(device_port, attempt)
                 
                 if result.success:
-                    print(f"[Flasher] ✓ SUCCESS on attempt {attempt}")
+                    logger.info("[Flasher] ✓ SUCCESS on attempt %s", attempt)
                     return result
                 else:
                     last_error = result.message
-                    print(f"[Flasher] ✗ FAILED: {result.message}")
+                    logger.info("[Flasher] ✗ FAILED: %s", result.message)
                     
+            except UnrecoverableFlashError as e:
+                error_msg = f"Flash aborted, not retrying: {e}"
+                logger.error("[Flasher] ✗ %s", error_msg)
+                return FlashResult(
+                    success=False,
+                    message=error_msg,
+                    duration=0.0,
+                    attempt=attempt
+                )
+            
             except Exception as e:
                 last_error = str(e)
-                print(f"[Flasher] ✗ ERROR: {e}")
+                logger.error("[Flasher] ✗ ERROR: %s", e)
             
             # Delay before retry (except last attempt)
             if attempt < self.retry_count:
-                print(f"[Flasher] Waiting {self.retry_delay}s before retry...")
-                time.sleep(self.retry_delay)
+                delay = self._backoff_delay(attempt)
+                logger.info("[Flasher] Waiting %.1fs before retry...", delay)
+                time.sleep(delay)
         
         # All attempts failed
         error_msg = f"Flash failed after {self.retry_count} attempts. Last error: {last_error}"
-        print(f"\n[Flasher] ✗ {error_msg}")
+        logger.error("\n[Flasher] ✗ %s", error_msg)
         
         return FlashResult(
             success=False,
@@ -84,6 +187,18 @@ class FirmwareFlasher:
             attempt=self.retry_count
         )
     
+    def _backoff_delay(self, attempt):
+        """Compute delay before the next attempt.
+        
+        Args:
+            attempt: Number of the attempt that just failed
+            
+        Returns:
+            Delay in seconds
+        """
+        delay = min(self.max_delay, self.base_delay * (2 ** (attempt - 1)))
+        return delay * (1 + self._rng.uniform(-self.jitter, self.jitter))
+    
     def _execute_flash(self, device_port, attempt):
         """Execute single flash attempt.
         
@@ -93,29 +208,26 @@ class FirmwareFlasher:
             
         Returns:
             FlashResult
+            
+        Raises:
+            UnrecoverableFlashError: If retrying cannot succeed
         """
         start_time = time.time()
 
-        print(f"[Flasher] Waiting for device to be ready...")
-        time.sleep(0.2)
+        self._wait_port_ready(device_port)
         
         # Build command
         command = self._build_command(device_port)
-        print(f"[Flasher] Command: {' '.join(command)}")
+        logger.info("[Flasher] Command: %s", ' '.join(command))
         
         try:
             # Execute flash command
-            result = subprocess.run(
-                command,
-                capture_output=True,
-                text=True,
-                timeout=self.timeout
-            )
+            returncode, output = self._run_tool(command, start_time + self.timeout)
             
             duration = time.time() - start_time
             
             # Check return code
-            if result.returncode == 0:
+            if returncode == 0:
                 return FlashResult(
                     success=True,
                     message="Flash completed successfully",
@@ -123,9 +235,13 @@ class FirmwareFlasher:
                     attempt=attempt
                 )
             else:
+                for line in output:
+                    if any(pattern in line for pattern in UNRECOVERABLE_ERRORS):
+                        raise UnrecoverableFlashError(line.strip())
+                
                 return FlashResult(
                     success=False,
-                    message=f"Tool returned error code {result.returncode}",
+                    message=f"Tool returned error code {returncode}",
                     duration=duration,
                     attempt=attempt
                 )
@@ -140,12 +256,98 @@ class FirmwareFlasher:
             )
         
         except FileNotFoundError:
-            return FlashResult(
-                success=False,
-                message=f"Flash tool not found: {command[0]}",
-                duration=0.0,
-                attempt=attempt
-            )
+            raise UnrecoverableFlashError(f"Flash tool not found: {command[0]}")
+        
+        except PermissionError:
+            raise UnrecoverableFlashError(f"Flash tool not executable: {command[0]}")
+    
+    def _wait_port_ready(self, device_port):
+        """Wait until the serial port node is present and accessible.
+        
+        Args:
+            device_port: Serial port path
+            
+        Raises:
+            UnrecoverableFlashError: If the port does not show up in time
+        """
+        deadline = time.monotonic() + PORT_READY_TIMEOUT
+        
+        while not (os.path.exists(device_port)
+                   and os.access(device_port, os.R_OK | os.W_OK)):
+            if time.monotonic() >= deadline:
+                raise UnrecoverableFlashError(f"Serial port not ready: {device_port}")
+            time.sleep(0.01)
+    
+    def _run_tool(self, command, deadline):
+        """Run flash tool, streaming its output line by line.
+        
+        Args:
+            command: Command as list
+            deadline: time.time() value after which the tool is killed
+            
+        Returns:
+            Tuple of (return code, last OUTPUT_TAIL_LINES output lines)
+            
+        Raises:
+            subprocess.TimeoutExpired: If the tool runs past the deadline
+        """
+        tail = deque(maxlen=OUTPUT_TAIL_LINES)
+        pending = b''
+        
+        # close_fds: descriptors opened by C extensions (lgpio, libudev's
+        # netlink socket) may lack O_CLOEXEC and must not reach the tool.
+        # Closing them costs the fast launch path on older Pythons: 3.10+
+        # still vfork()s (3.13+ may posix_spawn()), 3.9 does a full fork().
+        with subprocess.Popen(command,
+                              executable=shutil.which(command[0]),
+                              close_fds=True,
+                              pass_fds=(),
+                              stdout=subprocess.PIPE,
+                              stderr=subprocess.STDOUT) as proc:
+            fd = proc.stdout.fileno()
+            
+            with selectors.DefaultSelector() as selector:
+                selector.register(fd, selectors.EVENT_READ)
+                
+                while True:
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        proc.kill()
+                        raise subprocess.TimeoutExpired(command, self.timeout)
+                    
+                    if not selector.select(remaining):
+                        continue
+                    
+                    chunk = os.read(fd, 4096)
+                    if not chunk:
+                        break
+                    
+                    # esptool redraws progress with '\r', treat it as a line end
+                    *lines, pending = re.split(rb'[\r\n]', pending + chunk)
+                    for line in lines:
+                        self._handle_output_line(line, tail)
+            
+            self._handle_output_line(pending, tail)
+            
+            # Output closed; the tool is exiting
+            try:
+                returncode = proc.wait(timeout=max(deadline - time.time(), 0.1))
+            except subprocess.TimeoutExpired:
+                proc.kill()
+                raise
+        
+        return returncode, list(tail)
+    
+    def _handle_output_line(self, line, tail):
+        """Record one line of tool output and report progress."""
+        if not line:
+            return
+        
+        text = line.decode(errors='replace')
+        tail.append(text)
+        
+        if self.progress_callback:
+            self.progress_callback(text)
     
     def _build_command(self, device_port):
         """Build flash command.
@@ -156,13 +358,14 @@ class FirmwareFlasher:
         Returns:
             Command as list
         """
-        cmd_str = self.tool_command.format(
-            port=device_port,
-            firmware=self.firmware_path,
-            baudrate=self.baudrate
-        )
-        
-        return cmd_str.split()
+        return [
+            tok.format(
+                port=device_port,
+                firmware=self.firmware_path,
+                baudrate=self.baudrate
+            ) if needs_format else tok
+            for tok, needs_format in self._cmd_template
+        ]
     
     def verify_tool_available(self):
         """Check if flash tool is available.
@@ -170,14 +373,19 @@ class FirmwareFlasher:
         Returns:
             True if tool found
         """
-        tool_name = self.tool_command.split()[0]
+        tool_path = shutil.which(self._cmd_template[0][0])
+        if not tool_path:
+            return False
         
         try:
             result = subprocess.run(
-                [tool_name, '--version'],
+                [tool_path, '--version'],
                 capture_output=True,
                 timeout=5
             )
-            return result.returncode == 0
+            if result.returncode != 0:
+                return False
         except:
             return False
+        
+        return True
@@ -0,0 +1,64 @@
+"""Logging setup - buffered console output."""
+
+import logging
+import sys
+import time
+from threading import Thread, Event
+
+# Bytes buffered before a write(2) is forced
+LOG_BUFFER_SIZE = 64 * 1024
+
+# Banner separator
+SEP = "=" * 60
+
+class BufferedStreamHandler(logging.StreamHandler):
+    """Stream handler that batches writes and flushes them periodically."""
+    
+    def __init__(self, stream, flush_interval=0.1):
+        """Initialize handler.
+        
+        Args:
+            stream: Buffered text stream to write to
+            flush_interval: Max seconds a record stays in the buffer
+        """
+        super().__init__(stream)
+        self.flush_interval = flush_interval
+        self._dirty = Event()
+        
+        Thread(target=self._flush_loop, name='log-flush', daemon=True).start()
+    
+    def emit(self, record):
+        """Write record without flushing (StreamHandler flushes every record)."""
+        try:
+            self.stream.write(self.format(record) + self.terminator)
+            self._dirty.set()
+        except Exception:
+            self.handleError(record)
+    
+    def _flush_loop(self):
+        """Flush buffered records; sleeps until something was logged."""
+        while True:
+            self._dirty.wait()
+            time.sleep(self.flush_interval)
+            self._dirty.clear()
+            self.flush()
+
+def setup_logging(level=logging.INFO):
+    """Route all module loggers to buffered stdout.
+    
+    Args:
+        level: Root log level
+    
+    Returns:
+        The installed handler
+    """
+    stream = open(
+        sys.stdout.fileno(), 'w',
+        buffering=LOG_BUFFER_SIZE,
+        encoding='utf-8',
+        errors='replace',
+        closefd=False
+    )
+    handler = BufferedStreamHandler(stream)
+    logging.basicConfig(level=level, format='%(message)s', handlers=[handler])
+    return handler
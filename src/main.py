@@ -1,53 +1,78 @@
 """Main application - Secure version with USB firmware source."""
 
+import logging
+import os
 import sys
 import signal
 import time
+from dataclasses import dataclass, field
 from queue import Queue, Empty
+from threading import Thread, Event
+from typing import Optional
 
 from src.config import Config
+from src.log_setup import SEP, setup_logging
 from src.led_controller import LEDController
 from src.usb_monitor import USBMonitor
 from src.usb_storage_monitor import USBStorageMonitor
+from src.udev_dispatcher import UdevDispatcher
 from src.device_validator import DeviceValidator
 from src.usb_certificate_verifier import USBCertificateVerifier
 from src.firmware_flasher import FirmwareFlasher
 
-# Global state
-shutdown_requested = False
-current_usb_storage = None
-current_firmware_path = None
+logger = logging.getLogger(__name__)
+
+# Window for collecting duplicate events after the first one (seconds)
+EVENT_BATCH_WINDOW = 0.05
+
+@dataclass
+class AppState:
+    """Application state shared by the event handlers."""
+    usb_storage: Optional[object] = None
+    firmware_path: Optional[str] = None
+    event_queue: Optional[Queue] = None
+    shutdown: Event = field(default_factory=Event)
+
+state = AppState()
 
 def signal_handler(sig, frame):
     """Handle Ctrl+C gracefully."""
-    global shutdown_requested
-    print("\n[Main] Shutdown signal received...")
-    shutdown_requested = True
+    logger.info("\n[Main] Shutdown signal received...")
+    state.shutdown.set()
+    
+    # Wake the event loop. Queue.put() takes a lock the interrupted main
+    # thread may be holding, so post the sentinel from a helper thread.
+    if state.event_queue is not None:
+        Thread(target=state.event_queue.put, args=(('main', 'shutdown', None),), daemon=True).start()
 
 def main():
     """Main application function."""
-    global shutdown_requested, current_usb_storage, current_firmware_path
+    setup_logging()
     
     # Setup signal handler
     signal.signal(signal.SIGINT, signal_handler)
     signal.signal(signal.SIGTERM, signal_handler)
     
-    print("="*60)
-    print("  SECURE FIRMWARE UPDATER")
-    print("  with USB Certificate Verification")
-    print("="*60)
+    logger.info(SEP)
+    logger.info("  SECURE FIRMWARE UPDATER")
+    logger.info("  with USB Certificate Verification")
+    logger.info(SEP)
     
     try:
         # 1. Load configuration
-        print("\n[Main] Loading configuration...")
+        logger.info("\n[Main] Loading configuration...")
         config = Config()
+        # LOG_LEVEL env var wins, e.g. LOG_LEVEL=WARNING on field units
+        logging.getLogger().setLevel(
+            resolve_log_level(os.getenv('LOG_LEVEL') or config.get('logging.level', 'INFO'))
+        )
         
         # 2. Initialize components
-        print("\n[Main] Initializing components...")
+        logger.info("\n[Main] Initializing components...")
         
-        # Event queues
-        device_event_queue = Queue(maxsize=32)
-        storage_event_queue = Queue(maxsize=32)
+        # Single event queue; both monitors post (source, event_type, data)
+        event_queue = Queue(maxsize=64)
+        state.event_queue = event_queue
         
         # LED Controller
         led = LEDController(
@@ -60,7 +85,7 @@ def main():
         # USB Certificate Verifier
         cert_verifier = USBCertificateVerifier(
             public_key_path=config['security']['public_key_path'],
-            config=config.config
+            config=config.config_ns
         )
         
         # Device Validator (for target device - ESP32)
@@ -73,118 +98,166 @@ def main():
         flasher = FirmwareFlasher(config.config)
         
         # USB Monitors
-        device_monitor = USBMonitor(device_event_queue)
+        udev_dispatcher = UdevDispatcher()
+        device_monitor = USBMonitor(event_queue, dispatcher=udev_dispatcher)
         storage_monitor = USBStorageMonitor(
-            storage_event_queue,
+            event_queue,
             mount_base=config['usb_storage']['mount_base']
         )
         
         # Start monitoring
         device_monitor.start_monitoring()
         storage_monitor.start_monitoring()
+        udev_dispatcher.start()
         
-        print("\n" + "="*60)
-        print("  SYSTEM READY")
-        print("="*60)
-        print("\nSecurity Status:")
-        print(f"  Certificate Verification: {'ENABLED' if config['security']['require_certificate'] else 'DISABLED'}")
-        print(f"  Checksum Verification: {'ENABLED' if config['security']['verify_checksum'] else 'DISABLED'}")
-        print("\nTarget Device:")
-        print(f"  VID: {config['target_device']['vid']}")
-        print(f"  PID: {config['target_device']['pid']}")
-        print(f"  Name: {config['target_device']['name']}")
-        print("\nWaiting for USB storage and target device...")
-        print("Press Ctrl+C to exit\n")
+        logger.info("\n%s", SEP)
+        logger.info("  SYSTEM READY")
+        logger.info(SEP)
+        logger.info("\nSecurity Status:")
+        logger.info("  Certificate Verification: %s", 'ENABLED' if config['security']['require_certificate'] else 'DISABLED')
+        logger.info("  Checksum Verification: %s", 'ENABLED' if config['security']['verify_checksum'] else 'DISABLED')
+        logger.info("\nTarget Device:")
+        logger.info("  VID: %s", config['target_device']['vid'])
+        logger.info("  PID: %s", config['target_device']['pid'])
+        logger.info("  Name: %s", config['target_device']['name'])
+        logger.info("\nWaiting for USB storage and target device...")
+        logger.info("Press Ctrl+C to exit\n")
         
-        # Main event loop
-        while not shutdown_requested:
-            try:
-                # Check storage events (higher priority)
-                try:
-                    event_type, data = storage_event_queue.get(timeout=0.1)
-                    
-                    if event_type == 'usb_storage_mounted':
-                        handle_storage_mounted(data, cert_verifier, led)
-                    
-                    elif event_type == 'usb_storage_removed':
-                        handle_storage_removed(data, storage_monitor, led)
-                    
-                    storage_event_queue.task_done()
-                    continue
-                    
-                except Empty:
-                    pass
+        # Main event loop - blocks until an event or shutdown arrives
+        while not state.shutdown.is_set():
+            batch = collect_events(event_queue, event_queue.get())
+            
+            for source, event_type, data in batch:
+                if event_type == 'shutdown':
+                    break
                 
-                # Check device events
                 try:
-                    event_type, device = device_event_queue.get(timeout=0.1)
-                    
-                    if event_type == 'device_connected':
-                        handle_device_connected(
-                            device,
-                            device_validator,
-                            flasher,
-                            led
-                        )
-                    
-                    elif event_type == 'device_disconnected':
-                        print("[Main] Target device disconnected")
+                    if source == 'storage':
+                        if event_type == 'usb_storage_mounted':
+                            handle_storage_mounted(state, data, cert_verifier, led)
+                        
+                        elif event_type == 'usb_storage_removed':
+                            handle_storage_removed(state, data, storage_monitor, led)
                     
-                    device_event_queue.task_done()
+                    elif source == 'device':
+                        if event_type == 'device_connected':
+                            handle_device_connected(
+                                state,
+                                data,
+                                device_validator,
+                                flasher,
+                                led
+                            )
+                        
+                        elif event_type == 'device_disconnected':
+                            logger.info("[Main] Target device disconnected")
+                            device_validator.invalidate_port(data)
                     
-                except Empty:
-                    pass
+                except Exception as e:
+                    logger.exception("[Main] ERROR in event loop: %s", e)
                 
-            except Exception as e:
-                print(f"[Main] ERROR in event loop: {e}")
-                import traceback
-                traceback.print_exc()
+                event_queue.task_done()
     
     except KeyboardInterrupt:
-        print("\n[Main] Interrupted by user")
+        logger.info("\n[Main] Interrupted by user")
     
     except Exception as e:
-        print(f"\n[Main] FATAL ERROR: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("\n[Main] FATAL ERROR: %s", e)
         return 1
     
     finally:
         # Cleanup
-        print("\n[Main] Shutting down...")
+        logger.info("\n[Main] Shutting down...")
         
         try:
             device_monitor.stop_monitoring()
             storage_monitor.stop_monitoring()
+            udev_dispatcher.stop()
             
             # Unmount USB storage if still mounted
-            if current_usb_storage:
-                print(f"[Main] Unmounting {current_usb_storage.mount_point}...")
-                storage_monitor.unmount_device(current_usb_storage.mount_point)
+            if state.usb_storage:
+                logger.info("[Main] Unmounting %s...", state.usb_storage.mount_point)
+                storage_monitor.unmount_device(state.usb_storage.mount_point)
             
             led.cleanup()
         except Exception as e:
-            print(f"[Main] Cleanup error: {e}")
+            logger.error("[Main] Cleanup error: %s", e)
         
-        print("[Main] Shutdown complete")
+        logger.info("[Main] Shutdown complete")
+        logging.shutdown()
     
     return 0
 
-def handle_storage_mounted(storage, cert_verifier, led):
+def resolve_log_level(value):
+    """Turn a level name or number ("warning", "10") into a logging level.
+    
+    Args:
+        value: Level from LOG_LEVEL or config
+        
+    Returns:
+        Logging level int (INFO if value is not a known level)
+    """
+    name = str(value).strip().upper()
+    if name.isdigit():
+        return int(name)
+    
+    level = logging.getLevelName(name)
+    if isinstance(level, int):
+        return level
+    
+    logger.warning("[Main] Unknown log level %r, using INFO", value)
+    return logging.INFO
+
+def collect_events(event_queue, first_event):
+    """Gather events arriving right after first_event and drop duplicates.
+    
+    udev reports one insertion several times (device and interfaces), so
+    repeated device_connected events for the same device are collapsed.
+    
+    Args:
+        event_queue: Queue the monitors post to
+        first_event: Event already taken from the queue
+        
+    Returns:
+        List of (source, event_type, data) tuples to handle
+    """
+    events = [first_event]
+    deadline = time.monotonic() + EVENT_BATCH_WINDOW
+    
+    while (remaining := deadline - time.monotonic()) > 0:
+        try:
+            events.append(event_queue.get(timeout=remaining))
+        except Empty:
+            break
+    
+    batch = []
+    seen = set()
+    for source, event_type, data in events:
+        if event_type == 'device_connected':
+            # Interface sys_names ("1-1:1.0") belong to device "1-1"
+            key = (data.vid, data.pid, data.sys_name.split(':')[0])
+            if key in seen:
+                event_queue.task_done()
+                continue
+            seen.add(key)
+        batch.append((source, event_type, data))
+    
+    return batch
+
+def handle_storage_mounted(state, storage, cert_verifier, led):
     """Handle USB storage mounted event.
     
     Args:
+        state: AppState
         storage: USBStorage object
         cert_verifier: USBCertificateVerifier instance
         led: LEDController instance
     """
-    global current_usb_storage, current_firmware_path
-    
-    print(f"\n{'='*60}")
-    print(f"[Main] USB STORAGE MOUNTED")
-    print(f"{'='*60}")
-    print(f"Device: {storage.vendor} {storage.model}")
-    print(f"Mount point: {storage.mount_point}")
+    logger.info("\n%s", SEP)
+    logger.info("[Main] USB STORAGE MOUNTED")
+    logger.info(SEP)
+    logger.info("Device: %s %s", storage.vendor, storage.model)
+    logger.info("Mount point: %s", storage.mount_point)
     
     # Show validating state
     led.show_validating()
@@ -193,95 +266,93 @@ def handle_storage_mounted(storage, cert_verifier, led):
     result = cert_verifier.verify_usb_device(storage.mount_point)
     
     if result.success:
-        print(f"\n[Main] ✓ USB VERIFIED SUCCESSFULLY")
-        print(f"[Main] Firmware ready: {result.firmware_path}")
-        print(f"[Main] Device: {result.device_info.device_name}")
-        print(f"[Main] Version: {result.device_info.firmware_version}")
+        logger.info("\n[Main] ✓ USB VERIFIED SUCCESSFULLY")
+        logger.info("[Main] Firmware ready: %s", result.firmware_path)
+        logger.info("[Main] Device: %s", result.device_info.device_name)
+        logger.info("[Main] Version: %s", result.device_info.firmware_version)
         
         # Store verified USB info
-        current_usb_storage = storage
-        current_firmware_path = result.firmware_path
+        state.usb_storage = storage
+        state.firmware_path = result.firmware_path
         
         # Show success - ready to flash
         led.show_success()
         time.sleep(2)
         led.show_idle()
         
-        print(f"\n{'='*60}")
-        print(f"  READY TO FLASH")
-        print(f"{'='*60}")
-        print(f"Firmware: {current_firmware_path}")
-        print(f"Now plug in the target device (ESP32)...\n")
+        logger.info("\n%s", SEP)
+        logger.info("  READY TO FLASH")
+        logger.info(SEP)
+        logger.info("Firmware: %s", state.firmware_path)
+        logger.info("Now plug in the target device (ESP32)...\n")
         
     else:
-        print(f"\n[Main] ✗ USB VERIFICATION FAILED")
-        print(f"[Main] Reason: {result.message}")
+        logger.info("\n[Main] ✗ USB VERIFICATION FAILED")
+        logger.info("[Main] Reason: %s", result.message)
         
         # Show error
         led.show_error()
         time.sleep(5)
         led.show_idle()
         
-        print("\nPlease check:")
-        print("  1. USB contains valid certificate")
-        print("  2. Firmware checksum is correct")
-        print("  3. All required files are present\n")
+        logger.info("\nPlease check:")
+        logger.info("  1. USB contains valid certificate")
+        logger.info("  2. Firmware checksum is correct")
+        logger.info("  3. All required files are present\n")
 
-def handle_storage_removed(device_node, storage_monitor, led):
+def handle_storage_removed(state, device_node, storage_monitor, led):
     """Handle USB storage removed event.
     
     Args:
+        state: AppState
         device_node: Device node path
         storage_monitor: USBStorageMonitor instance
         led: LEDController instance
     """
-    global current_usb_storage, current_firmware_path
+    logger.info("\n[Main] USB storage removed")
     
-    print(f"\n[Main] USB storage removed")
-    
-    if current_usb_storage:
+    if state.usb_storage:
         # Try to unmount
-        storage_monitor.unmount_device(current_usb_storage.mount_point)
+        storage_monitor.unmount_device(state.usb_storage.mount_point)
         
         # Clear current USB info
-        current_usb_storage = None
-        current_firmware_path = None
+        state.usb_storage = None
+        state.firmware_path = None
         
-        print("[Main] Firmware source cleared")
-        print("[Main] Waiting for new USB storage...\n")
+        logger.info("[Main] Firmware source cleared")
+        logger.info("[Main] Waiting for new USB storage...\n")
     
     led.show_idle()
 
-def handle_device_connected(device, device_validator, flasher, led):
+def handle_device_connected(state, device, device_validator, flasher, led):
     """Handle target device connected event.
     
     Args:
+        state: AppState
         device: USBDevice object
         device_validator: DeviceValidator instance
         flasher: FirmwareFlasher instance
         led: LEDController instance
     """
-    global current_firmware_path
-    
-    print(f"\n{'='*60}")
-    print(f"[Main] TARGET DEVICE CONNECTED")
-    print(f"{'='*60}")
-    print(f"Device: {device}")
+    logger.info("\n%s", SEP)
+    logger.info("[Main] TARGET DEVICE CONNECTED")
+    logger.info(SEP)
+    logger.info("Device: %s", device)
     
     # Validate device
     led.show_validating()
     
     if not device_validator.is_valid_device(device):
-        print("[Main] ✗ Unknown device, ignoring")
+        logger.info("[Main] ✗ Unknown device, ignoring")
         led.show_idle()
         return
     
-    print("[Main] ✓ Valid target device detected!")
+    logger.info("[Main] ✓ Valid target device detected!")
     
     # Check if we have firmware ready
-    if not current_firmware_path:
-        print("\n[Main] ✗ NO FIRMWARE AVAILABLE")
-        print("[Main] Please insert USB storage with firmware first!\n")
+    if not state.firmware_path:
+        logger.info("\n[Main] ✗ NO FIRMWARE AVAILABLE")
+        logger.info("[Main] Please insert USB storage with firmware first!\n")
         
         led.show_error()
         time.sleep(3)
@@ -292,41 +363,41 @@ def handle_device_connected(device, device_validator, flasher, led):
     port = device_validator.get_device_port(device)
     
     if not port:
-        print("[Main] ✗ No valid serial port found")
+        logger.info("[Main] ✗ No valid serial port found")
         led.show_error()
         time.sleep(3)
         led.show_idle()
         return
     
-    print(f"[Main] Port: {port}")
-    print(f"[Main] Firmware: {current_firmware_path}")
+    logger.info("[Main] Port: %s", port)
+    logger.info("[Main] Firmware: %s", state.firmware_path)
     
     # Flash firmware
     led.show_updating()
     
     # Update flasher with firmware from USB
-    flasher.firmware_path = current_firmware_path
+    flasher.firmware_path = state.firmware_path
     
     result = flasher.flash(port)
     
     # Handle result
     if result.success:
-        print(f"\n{'='*60}")
-        print(f"  ✓ FLASH SUCCESSFUL!")
-        print(f"{'='*60}")
-        print(f"Duration: {result.duration:.1f}s")
-        print(f"Attempts: {result.attempt}")
-        print(f"Firmware: {current_firmware_path}")
-        print(f"{'='*60}\n")
+        logger.info("\n%s", SEP)
+        logger.info("  ✓ FLASH SUCCESSFUL!")
+        logger.info(SEP)
+        logger.info("Duration: %.1fs", result.duration)
+        logger.info("Attempts: %s", result.attempt)
+        logger.info("Firmware: %s", state.firmware_path)
+        logger.info("%s\n", SEP)
         
         led.show_success()
         time.sleep(5)
     else:
-        print(f"\n{'='*60}")
-        print(f"  ✗ FLASH FAILED!")
-        print(f"{'='*60}")
-        print(f"Error: {result.message}")
-        print(f"{'='*60}\n")
+        logger.info("\n%s", SEP)
+        logger.info("  ✗ FLASH FAILED!")
+        logger.info(SEP)
+        logger.info("Error: %s", result.message)
+        logger.info("%s\n", SEP)
         
         led.show_error()
         time.sleep(5)
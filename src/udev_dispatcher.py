@@ -0,0 +1,78 @@
+"""Udev dispatcher - serve several netlink monitors from one thread."""
+
+import logging
+import os
+import selectors
+from threading import Thread
+
+logger = logging.getLogger(__name__)
+
+class UdevDispatcher:
+    """Wait on pyudev monitors with one selector and run their callbacks."""
+    
+    def __init__(self):
+        """Initialize dispatcher."""
+        self.selector = selectors.DefaultSelector()
+        
+        # Self-pipe: writing to it breaks select() on shutdown
+        self._wake_r, self._wake_w = os.pipe()
+        self.selector.register(self._wake_r, selectors.EVENT_READ, None)
+        
+        self.thread = None
+    
+    def register(self, monitor, callback):
+        """Start monitor and call callback(device) for each of its events.
+        
+        Args:
+            monitor: pyudev.Monitor
+            callback: Callable taking a pyudev device
+        """
+        monitor.start()
+        self.selector.register(monitor.fileno(), selectors.EVENT_READ, (monitor, callback))
+    
+    def unregister(self, monitor):
+        """Stop dispatching events of monitor.
+        
+        Args:
+            monitor: pyudev.Monitor previously registered
+        """
+        try:
+            self.selector.unregister(monitor.fileno())
+        except KeyError:
+            pass
+    
+    def start(self):
+        """Start dispatch thread (no-op if already running)."""
+        if self.thread and self.thread.is_alive():
+            return
+        
+        self.thread = Thread(target=self._run, name='udev-dispatcher', daemon=True)
+        self.thread.start()
+        logger.info("[Udev] Dispatcher started")
+    
+    def stop(self):
+        """Stop dispatch thread."""
+        if self.thread:
+            os.write(self._wake_w, b'\0')
+            self.thread.join(timeout=2.0)
+            self.thread = None
+        logger.info("[Udev] Dispatcher stopped")
+    
+    def _run(self):
+        """Dispatch loop (runs in thread)."""
+        while True:
+            for key, _ in self.selector.select():
+                if key.data is None:
+                    # Woken by stop()
+                    os.read(self._wake_r, 1)
+                    return
+                
+                monitor, callback = key.data
+                device = monitor.poll(timeout=0)
+                if device is None:
+                    continue
+                
+                try:
+                    callback(device)
+                except Exception as e:
+                    logger.exception("[Udev] Error handling event: %s", e)
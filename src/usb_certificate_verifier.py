@@ -1,13 +1,57 @@
 """USB Certificate Verification Module."""
 
+import logging
 import os
 import json
 import hashlib
-import subprocess
+import hmac
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from dataclasses import dataclass
 
-@dataclass
+from cryptography.exceptions import InvalidSignature
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.asymmetric import padding
+from cryptography.hazmat.primitives.serialization import load_pem_public_key
+
+from src.compat import DATACLASS_SLOTS
+from src.log_setup import SEP
+
+# orjson parses UTF-8 bytes directly; optional
+try:
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:
+    _json_loads = json.loads
+
+# inotify_simple lets us wait for late files without polling; optional
+try:
+    import inotify_simple
+except ImportError:
+    inotify_simple = None
+
+logger = logging.getLogger(__name__)
+
+# Read size for hashing firmware (1 MiB)
+HASH_CHUNK_SIZE = 1 << 20
+
+# Max remembered good signatures
+VERIFY_CACHE_SIZE = 32
+
+# Max wait for required files to appear on a fresh mount (seconds)
+FILE_WAIT_TIMEOUT = 5.0
+
+@dataclass(**DATACLASS_SLOTS)
+class _Paths:
+    """Absolute paths of the files on a mounted USB."""
+    info: str
+    firmware: str
+    cert: str
+    checksum: str
+
+@dataclass(**DATACLASS_SLOTS)
 class USBDeviceInfo:
     """USB device information from device_info.json."""
     device_id: str
@@ -16,7 +60,7 @@ class USBDeviceInfo:
     created_at: str
     target_device: str
 
-@dataclass
+@dataclass(**DATACLASS_SLOTS)
 class VerificationResult:
     """Result of USB verification."""
     success: bool
@@ -33,18 +77,27 @@ class USBCertificateVerifier:
         
         Args:
             public_key_path: Path to RSA public key
-            config: Configuration dict
+            config: Configuration namespace (Config.config_ns)
         """
         self.public_key_path = public_key_path
         self.config = config
         
+        # sha256(device_info || certificate) -> verified VerificationResult
+        self._verify_cache = {}
+        self._verify_cache_lock = threading.Lock()
+        self._verify_cache_key_mtime = None
+        
         # Check if public key exists
         if not os.path.exists(public_key_path):
-            print(f"[CertVerifier] ⚠️  Public key not found: {public_key_path}")
-            print("[CertVerifier] Security disabled!")
+            logger.warning("[CertVerifier] ⚠️  Public key not found: %s", public_key_path)
+            logger.warning("[CertVerifier] Security disabled!")
             self.security_enabled = False
+            self._pubkey = None
         else:
-            print(f"[CertVerifier] ✓ Public key loaded: {public_key_path}")
+            self._verify_cache_key_mtime = os.stat(public_key_path).st_mtime_ns
+            self._pubkey = self._load_public_key()
+            if self._pubkey:
+                logger.info("[CertVerifier] ✓ Public key loaded: %s", public_key_path)
             self.security_enabled = True
     
     def verify_usb_device(self, mount_point):
@@ -56,52 +109,65 @@ class USBCertificateVerifier:
         Returns:
             VerificationResult
         """
-        print(f"\n{'='*60}")
-        print(f"[CertVerifier] Verifying USB at: {mount_point}")
-        print(f"{'='*60}")
+        logger.info("\n%s", SEP)
+        logger.info("[CertVerifier] Verifying USB at: %s", mount_point)
+        logger.info(SEP)
         
         try:
+            # Resolve file paths once for all steps
+            firmware_cfg = self.config.firmware
+            paths = _Paths(
+                info=os.path.join(mount_point, firmware_cfg.device_info_path),
+                firmware=os.path.join(mount_point, firmware_cfg.usb_path),
+                cert=os.path.join(mount_point, firmware_cfg.certificate_path),
+                checksum=os.path.join(mount_point, firmware_cfg.checksum_path)
+            )
+            
             # Step 1: Check file structure
-            result = self._check_file_structure(mount_point)
+            result = self._check_file_structure(paths)
             if not result.success:
                 return result
             
             # Step 2: Load device info
-            device_info = self._load_device_info(mount_point)
+            device_info = self._load_device_info(paths)
             if not device_info:
                 return VerificationResult(
                     success=False,
                     message="Failed to load device_info.json"
                 )
             
-            print(f"[CertVerifier] Device: {device_info.device_name}")
-            print(f"[CertVerifier] Target: {device_info.target_device}")
-            print(f"[CertVerifier] Version: {device_info.firmware_version}")
+            logger.info("[CertVerifier] Device: %s", device_info.device_name)
+            logger.info("[CertVerifier] Target: %s", device_info.target_device)
+            logger.info("[CertVerifier] Version: %s", device_info.firmware_version)
+            
+            # Steps 3 and 4 are independent: run them in parallel
+            checks = []
             
             # Step 3: Verify certificate (if enabled)
-            if self.security_enabled and self.config['security']['require_certificate']:
-                result = self._verify_certificate(mount_point)
-                if not result.success:
-                    return result
+            if self.security_enabled and self.config.security.require_certificate:
+                checks.append(self._verify_certificate)
             else:
-                print("[CertVerifier] ⚠️  Certificate verification SKIPPED")
+                logger.warning("[CertVerifier] ⚠️  Certificate verification SKIPPED")
             
             # Step 4: Verify firmware checksum
-            if self.config['security']['verify_checksum']:
-                result = self._verify_firmware_checksum(mount_point)
-                if not result.success:
-                    return result
+            if self.config.security.verify_checksum:
+                checks.append(self._verify_firmware_checksum)
             else:
-                print("[CertVerifier] ⚠️  Checksum verification SKIPPED")
+                logger.warning("[CertVerifier] ⚠️  Checksum verification SKIPPED")
+            
+            if checks:
+                with ThreadPoolExecutor(max_workers=len(checks)) as executor:
+                    futures = [executor.submit(check, paths) for check in checks]
+                    for future in futures:
+                        result = future.result()
+                        if not result.success:
+                            return result
             
             # All checks passed
-            firmware_path = os.path.join(
-                mount_point,
-                self.config['firmware']['usb_path']
-            )
+            firmware_path = paths.firmware
             
-            print(f"\n[CertVerifier] ✓ USB VERIFIED SUCCESSFULLY")
-            print(f"[CertVerifier] Firmware ready: {firmware_path}")
+            logger.info("\n[CertVerifier] ✓ USB VERIFIED SUCCESSFULLY")
+            logger.info("[CertVerifier] Firmware ready: %s", firmware_path)
             
             return VerificationResult(
                 success=True,
@@ -112,44 +178,45 @@ class USBCertificateVerifier:
             )
             
         except Exception as e:
-            print(f"[CertVerifier] ✗ Verification error: {e}")
-            import traceback
-            traceback.print_exc()
+            logger.exception("[CertVerifier] ✗ Verification error: %s", e)
             return VerificationResult(
                 success=False,
                 message=f"Verification error: {str(e)}"
             )
     
-    def _check_file_structure(self, mount_point):
+    def _check_file_structure(self, paths):
         """Check if USB has required files.
         
         Args:
-            mount_point: USB mount point
+            paths: _Paths of the USB files
             
         Returns:
             VerificationResult
         """
-        print("\n[CertVerifier] Step 1: Checking file structure...")
+        logger.info("\n[CertVerifier] Step 1: Checking file structure...")
         
+        firmware_cfg = self.config.firmware
         required_files = [
-            self.config['firmware']['device_info_path'],
-            self.config['firmware']['usb_path'],
+            (firmware_cfg.device_info_path, paths.info),
+            (firmware_cfg.usb_path, paths.firmware),
         ]
         
-        if self.config['security']['require_certificate']:
-            required_files.append(self.config['firmware']['certificate_path'])
+        if self.config.security.require_certificate:
+            required_files.append((firmware_cfg.certificate_path, paths.cert))
         
-        if self.config['security']['verify_checksum']:
-            required_files.append(self.config['firmware']['checksum_path'])
+        if self.config.security.verify_checksum:
+            required_files.append((firmware_cfg.checksum_path, paths.checksum))
+        
+        # Files may still be appearing right after mount; wait for them
+        listings = self._await_files([full_path for _, full_path in required_files])
         
         missing_files = []
-        for file_path in required_files:
-            full_path = os.path.join(mount_point, file_path)
-            if not os.path.exists(full_path):
+        for file_path, full_path in required_files:
+            if self._missing([full_path], listings):
                 missing_files.append(file_path)
-                print(f"[CertVerifier] ✗ Missing: {file_path}")
+                logger.info("[CertVerifier] ✗ Missing: %s", file_path)
             else:
-                print(f"[CertVerifier] ✓ Found: {file_path}")
+                logger.info("[CertVerifier] ✓ Found: %s", file_path)
         
         if missing_files:
             return VerificationResult(
@@ -159,25 +226,89 @@ class USBCertificateVerifier:
         
         return VerificationResult(success=True, message="File structure OK")
     
-    def _load_device_info(self, mount_point):
+    def _await_files(self, full_paths, timeout=FILE_WAIT_TIMEOUT):
+        """Wait until all files exist, using inotify instead of polling.
+        
+        Returns at once when everything is already present, or when
+        inotify_simple is not installed.
+        
+        Args:
+            full_paths: Absolute paths of required files
+            timeout: Max seconds to wait
+            
+        Returns:
+            Dict of directory -> set of entry names
+        """
+        # One directory listing per folder instead of a stat per file
+        listings = {os.path.dirname(p): None for p in full_paths}
+        for dir_path in listings:
+            listings[dir_path] = self._list_dir(dir_path)
+        
+        if inotify_simple is None or not self._missing(full_paths, listings):
+            return listings
+        
+        flags = inotify_simple.flags
+        mask = flags.CREATE | flags.CLOSE_WRITE | flags.MOVED_TO
+        deadline = time.monotonic() + timeout
+        watched = set()
+        
+        with inotify_simple.INotify() as inotify:
+            while True:
+                # Watch each folder, or its parent until the folder exists
+                for dir_path in listings:
+                    target = dir_path if os.path.isdir(dir_path) else os.path.dirname(dir_path)
+                    if target not in watched:
+                        try:
+                            inotify.add_watch(target, mask)
+                            watched.add(target)
+                        except OSError:
+                            pass
+                
+                # Rescan after arming, so nothing slips in unobserved
+                for dir_path in listings:
+                    listings[dir_path] = self._list_dir(dir_path)
+                if not self._missing(full_paths, listings):
+                    break
+                
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not inotify.read(timeout=int(remaining * 1000)):
+                    break
+        
+        return listings
+    
+    def _missing(self, full_paths, listings):
+        """Return the paths not present in listings.
+        
+        Names absent from a listing still get a stat, so case-insensitive
+        filesystems (vfat) match as before.
+        """
+        return [
+            p for p in full_paths
+            if os.path.basename(p) not in listings[os.path.dirname(p)]
+            and not os.path.exists(p)
+        ]
+    
+    def _list_dir(self, dir_path):
+        """Return the entry names in dir_path (empty if it can't be read)."""
+        try:
+            with os.scandir(dir_path) as it:
+                return {entry.name for entry in it}
+        except OSError:
+            return set()
+    
+    def _load_device_info(self, paths):
         """Load device_info.json.
         
         Args:
-            mount_point: USB mount point
+            paths: _Paths of the USB files
             
         Returns:
             USBDeviceInfo or None
         """
-        print("\n[CertVerifier] Step 2: Loading device info...")
+        logger.info("\n[CertVerifier] Step 2: Loading device info...")
         
         try:
-            info_path = os.path.join(
-                mount_point,
-                self.config['firmware']['device_info_path']
-            )
-            
-            with open(info_path, 'r') as f:
-                data = json.load(f)
+            data = _json_loads(Path(paths.info).read_bytes())
             
             return USBDeviceInfo(
                 device_id=data['device_id'],
@@ -187,109 +318,148 @@ class USBCertificateVerifier:
                 target_device=data['target_device']
             )
         except Exception as e:
-            print(f"[CertVerifier] ✗ Failed to load device info: {e}")
+            logger.info("[CertVerifier] ✗ Failed to load device info: %s", e)
             return None
     
-    def _verify_certificate(self, mount_point):
+    def _verify_certificate(self, paths):
         """Verify digital signature of device_info.json.
         
         Args:
-            mount_point: USB mount point
+            paths: _Paths of the USB files
             
         Returns:
             VerificationResult
         """
-        print("\n[CertVerifier] Step 3: Verifying certificate...")
+        logger.info("\n[CertVerifier] Step 3: Verifying certificate...")
         
         try:
-            cert_path = os.path.join(
-                mount_point,
-                self.config['firmware']['certificate_path']
-            )
-            info_path = os.path.join(
-                mount_point,
-                self.config['firmware']['device_info_path']
-            )
-            
-            # Use OpenSSL to verify signature
-            cmd = [
-                'openssl', 'dgst', '-sha256',
-                '-verify', self.public_key_path,
-                '-signature', cert_path,
-                info_path
-            ]
+            with open(paths.info, 'rb') as f:
+                info_bytes = f.read()
+            with open(paths.cert, 'rb') as f:
+                cert_bytes = f.read()
             
-            result = subprocess.run(
-                cmd,
-                capture_output=True,
-                text=True,
-                timeout=10
-            )
+            cache_key = hashlib.sha256(info_bytes + b"|" + cert_bytes).digest()
+            cached = self._get_cached_verification(cache_key)
+            if cached:
+                logger.info("[CertVerifier] ✓ Certificate VERIFIED (cached)")
+                return cached
             
-            if result.returncode == 0:
-                print("[CertVerifier] ✓ Certificate VERIFIED")
+            pubkey = self._pubkey
+            if pubkey is None:
                 return VerificationResult(
-                    success=True,
-                    message="Certificate verified"
+                    success=False,
+                    message="Public key could not be loaded"
                 )
-            else:
-                print(f"[CertVerifier] ✗ Certificate verification FAILED")
-                print(f"[CertVerifier] Error: {result.stderr}")
+            
+            # Same check as `openssl dgst -sha256 -verify`, done in-process
+            try:
+                pubkey.verify(cert_bytes, info_bytes, padding.PKCS1v15(), hashes.SHA256())
+            except InvalidSignature:
+                logger.info("[CertVerifier] ✗ Certificate verification FAILED")
                 return VerificationResult(
                     success=False,
                     message="Invalid certificate signature"
                 )
-                
-        except subprocess.TimeoutExpired:
-            return VerificationResult(
-                success=False,
-                message="Certificate verification timeout"
+            
+            logger.info("[CertVerifier] ✓ Certificate VERIFIED")
+            verified = VerificationResult(
+                success=True,
+                message="Certificate verified"
             )
+            self._cache_verification(cache_key, verified)
+            return verified
+                
         except Exception as e:
             return VerificationResult(
                 success=False,
                 message=f"Certificate verification error: {str(e)}"
             )
     
-    def _verify_firmware_checksum(self, mount_point):
+    def _get_cached_verification(self, cache_key):
+        """Look up a previously verified signature.
+        
+        The cache is dropped (and the key reloaded) whenever the public
+        key file changes.
+        
+        Args:
+            cache_key: Digest of device_info and certificate bytes
+            
+        Returns:
+            Cached VerificationResult or None
+        """
+        try:
+            key_mtime = os.stat(self.public_key_path).st_mtime_ns
+        except OSError:
+            key_mtime = None
+        
+        with self._verify_cache_lock:
+            if key_mtime != self._verify_cache_key_mtime:
+                self._verify_cache.clear()
+                self._verify_cache_key_mtime = key_mtime
+                self._pubkey = self._load_public_key()
+            return self._verify_cache.get(cache_key)
+    
+    def _load_public_key(self):
+        """Load RSA public key from public_key_path.
+        
+        Returns:
+            Public key object or None if it cannot be loaded
+        """
+        try:
+            with open(self.public_key_path, 'rb') as f:
+                return load_pem_public_key(f.read())
+        except Exception as e:
+            logger.error("[CertVerifier] ✗ Cannot load public key %s: %s", self.public_key_path, e)
+            return None
+    
+    def _cache_verification(self, cache_key, result):
+        """Remember a successful signature verification.
+        
+        Args:
+            cache_key: Digest of device_info and certificate bytes
+            result: VerificationResult to return on later hits
+        """
+        with self._verify_cache_lock:
+            if len(self._verify_cache) >= VERIFY_CACHE_SIZE:
+                # Evict oldest entry
+                del self._verify_cache[next(iter(self._verify_cache))]
+            self._verify_cache[cache_key] = result
+    
+    def _verify_firmware_checksum(self, paths):
         """Verify firmware file checksum.
         
         Args:
-            mount_point: USB mount point
+            paths: _Paths of the USB files
             
         Returns:
             VerificationResult
         """
-        print("\n[CertVerifier] Step 4: Verifying firmware checksum...")
+        logger.info("\n[CertVerifier] Step 4: Verifying firmware checksum...")
         
         try:
-            firmware_path = os.path.join(
-                mount_point,
-                self.config['firmware']['usb_path']
-            )
-            checksum_path = os.path.join(
-                mount_point,
-                self.config['firmware']['checksum_path']
-            )
+            firmware_path = paths.firmware
             
-            # Read expected checksum
-            with open(checksum_path, 'r') as f:
-                expected_checksum = f.read().strip()
+            # Read expected checksum (sha256sum format: "<hex>  <name>")
+            with open(paths.checksum, 'r') as f:
+                expected_hex = f.read().split(maxsplit=1)[0]
+            expected_digest = bytes.fromhex(expected_hex)
             
-            print(f"[CertVerifier] Expected: {expected_checksum}")
+            logger.debug("[CertVerifier] Expected: %s", expected_hex)
             
-            # Calculate actual checksum
-            actual_checksum = self._calculate_sha256(firmware_path)
-            print(f"[CertVerifier] Actual:   {actual_checksum}")
+            # Always hash: mount points are reused across sticks and mtimes
+            # on removable media can be set to anything
+            actual_digest = self._digest_bytes(firmware_path)
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("[CertVerifier] Actual:   %s", actual_digest.hex())
             
-            if actual_checksum == expected_checksum:
-                print("[CertVerifier] ✓ Checksum MATCHED")
+            if hmac.compare_digest(actual_digest, expected_digest):
+                logger.info("[CertVerifier] ✓ Checksum MATCHED")
                 return VerificationResult(
                     success=True,
                     message="Firmware checksum verified"
                 )
             else:
-                print("[CertVerifier] ✗ Checksum MISMATCH")
+                logger.info("[CertVerifier] ✗ Checksum MISMATCH")
                 return VerificationResult(
                     success=False,
                     message="Firmware checksum mismatch - file may be corrupted"
@@ -301,19 +471,28 @@ class USBCertificateVerifier:
                 message=f"Checksum verification error: {str(e)}"
             )
     
-    def _calculate_sha256(self, file_path):
+    def _digest_bytes(self, file_path):
         """Calculate SHA256 hash of a file.
         
         Args:
             file_path: Path to file
             
         Returns:
-            Hex string of hash
+            Raw 32-byte digest
         """
-        sha256_hash = hashlib.sha256()
-        
-        with open(file_path, 'rb') as f:
-            for byte_block in iter(lambda: f.read(4096), b""):
+        # Read, never mmap: the file sits on a removable stick, and pulling
+        # it mid-hash turns a mapped read into SIGBUS instead of an OSError
+        with open(file_path, 'rb', buffering=HASH_CHUNK_SIZE) as f:
+            # Hint the kernel to read ahead aggressively
+            if hasattr(os, 'posix_fadvise'):
+                os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+            
+            # Python 3.11+: read/update loop runs in C
+            if hasattr(hashlib, 'file_digest'):
+                return hashlib.file_digest(f, 'sha256').digest()
+            
+            sha256_hash = hashlib.sha256()
+            for byte_block in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
                 sha256_hash.update(byte_block)
         
-        return sha256_hash.hexdigest()
\ No newline at end of file
+        return sha256_hash.digest()
\ No newline at end of file
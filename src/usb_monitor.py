@@ -1,52 +1,78 @@
+import logging
+import time
 import pyudev
-from queue import Queue
+from queue import Queue, Full
 from dataclasses import dataclass
 
-@dataclass
+from src.compat import DATACLASS_SLOTS
+from src.udev_dispatcher import UdevDispatcher
+
+logger = logging.getLogger(__name__)
+
+# Max wait for a serial port (tty) to appear after a USB device is added
+SERIAL_PORT_TIMEOUT = 2.0
+
+# Repeated udev notifications for the same device/action within this
+# window (seconds) are dropped
+EVENT_DEBOUNCE = 0.3
+
+# Debounce entries older than this (seconds) are pruned
+DEBOUNCE_PRUNE_AGE = 5.0
+
+@dataclass(**DATACLASS_SLOTS)
 class USBDevice:
     """USB device information."""
     sys_name: str
     device_node: str
-    vid: str
-    pid: str
+    vid: int
+    pid: int
     
     def __repr__(self):
-        return f"USBDevice(vid={self.vid}, pid={self.pid}, port={self.device_node})"
+        return f"USBDevice(vid={self.vid:04x}, pid={self.pid:04x}, port={self.device_node})"
 
 class USBMonitor:
     """Monitor USB device events."""
     
-    def __init__(self, event_queue):
+    def __init__(self, event_queue, dispatcher=None):
         """Initialize USB monitor.
         
         Args:
             event_queue: Queue to post events
+            dispatcher: Shared UdevDispatcher (a private one if None)
         """
         self.event_queue = event_queue
+        self.dispatcher = dispatcher or UdevDispatcher()
+        self._owns_dispatcher = dispatcher is None
         
         self.context = pyudev.Context()
         self.monitor = pyudev.Monitor.from_netlink(self.context)
         self.monitor.filter_by(subsystem='usb')
         
-        self.observer = None
-        print("[USB] Monitor initialized")
+        # Announces tty nodes created for newly added USB serial devices
+        self.tty_monitor = pyudev.Monitor.from_netlink(self.context)
+        self.tty_monitor.filter_by(subsystem='tty')
+        
+        # (sys_name, action) -> monotonic time last seen
+        self._recent = {}
+        self._last_prune = 0.0
+        
+        logger.info("[USB] Monitor initialized")
     
     def start_monitoring(self):
         """Start monitoring in background."""
-        self.observer = pyudev.MonitorObserver(
-            self.monitor,
-            callback=self._handle_event,
-            name='usb-monitor'
-        )
-        self.observer.start()
-        print("[USB] Monitoring started")
+        self.tty_monitor.start()
+        
+        self.dispatcher.register(self.monitor, self._handle_event)
+        if self._owns_dispatcher:
+            self.dispatcher.start()
+        logger.info("[USB] Monitoring started")
     
     def stop_monitoring(self):
         """Stop monitoring."""
-        if self.observer:
-            self.observer.stop()
-            self.observer = None
-        print("[USB] Monitoring stopped")
+        self.dispatcher.unregister(self.monitor)
+        if self._owns_dispatcher:
+            self.dispatcher.stop()
+        logger.info("[USB] Monitoring stopped")
     
     def _find_serial_port(self, usb_device):
       """Find serial port for USB device.
@@ -57,27 +83,76 @@ class USBMonitor:
       Returns:
           Serial port path or None
       """
-      import time
-      
-      # Wait for TTY device to be created
-      time.sleep(0.5)
-      
       try:
-          # List all TTY devices
+          # Discard tty events queued since the last wait; they are stale and
+          # left unread would overflow the socket and lose the add we need
+          while self.tty_monitor.poll(timeout=0) is not None:
+              pass
+          
+          # The TTY device often exists already
           for tty in self.context.list_devices(subsystem='tty'):
-              # Get parent USB device
-              parent = tty.find_parent('usb', 'usb_device')
-              
-              if parent and parent.device_path == usb_device.device_path:
-                  port = tty.device_node
+              port = self._match_tty(tty, usb_device)
+              if port:
+                  return port
+          
+          # Interfaces never own the tty's usb_device parent; don't wait for them
+          if usb_device.device_type != 'usb_device':
+              return None
+          
+          # Otherwise wait for udev to announce it
+          deadline = time.monotonic() + SERIAL_PORT_TIMEOUT
+          while (remaining := deadline - time.monotonic()) > 0:
+              tty = self.tty_monitor.poll(timeout=remaining)
+              if tty is None:
+                  break
+              if tty.action == 'add':
+                  port = self._match_tty(tty, usb_device)
                   if port:
-                      print(f"[USB] Found serial port: {port}")
                       return port
       except Exception as e:
-          print(f"[USB] Error finding serial port: {e}")
+          logger.error("[USB] Error finding serial port: %s", e)
       
       return None
     
+    def _match_tty(self, tty, usb_device):
+        """Return tty's device node if it belongs to usb_device."""
+        # Get parent USB device
+        parent = tty.find_parent('usb', 'usb_device')
+        
+        if parent and parent.device_path == usb_device.device_path:
+            port = tty.device_node
+            if port:
+                logger.info("[USB] Found serial port: %s", port)
+                return port
+        
+        return None
+    
+    def _is_duplicate(self, sys_name, action):
+        """Check if this event repeats one seen within EVENT_DEBOUNCE.
+        
+        Args:
+            sys_name: Device sys_name
+            action: udev action
+            
+        Returns:
+            True if the event should be dropped
+        """
+        now = time.monotonic()
+        key = (sys_name, action)
+        
+        if now - self._recent.get(key, float('-inf')) < EVENT_DEBOUNCE:
+            return True
+        self._recent[key] = now
+        
+        if now - self._last_prune > DEBOUNCE_PRUNE_AGE:
+            self._recent = {
+                k: t for k, t in self._recent.items()
+                if now - t <= DEBOUNCE_PRUNE_AGE
+            }
+            self._last_prune = now
+        
+        return False
+    
     def _handle_event(self, device):
         """Handle USB event - IMPROVED VERSION."""
         action = device.action
@@ -85,9 +160,15 @@ class USBMonitor:
         if action not in ('add', 'remove'):
             return
         
-        # Get device info
-        vid = device.get('ID_VENDOR_ID', '')
-        pid = device.get('ID_MODEL_ID', '')
+        if self._is_duplicate(device.sys_name, action):
+            return
+        
+        # Get device info (hex strings from udev, parsed once)
+        try:
+            vid = int(device.get('ID_VENDOR_ID') or '0', 16)
+            pid = int(device.get('ID_MODEL_ID') or '0', 16)
+        except ValueError:
+            return
         
         if not vid or not pid:
             return
@@ -96,15 +177,15 @@ class USBMonitor:
         # Bỏ qua USB storage (mass storage class)
         device_class = device.get('ID_USB_CLASS_FROM_DATABASE', '')
         if 'Mass Storage' in device_class:
-            print(f"[USB] Ignoring mass storage device: {vid}:{pid}")
+            logger.info("[USB] Ignoring mass storage device: %04x:%04x", vid, pid)
             return
         
         # Hoặc check bằng driver
         if device.get('ID_USB_DRIVER') == 'usb-storage':
             return
         
-        # Find serial port for USB device
-        serial_port = self._find_serial_port(device)
+        # Find serial port for USB device (gone already on remove)
+        serial_port = self._find_serial_port(device) if action == 'add' else None
         
         if not serial_port:
             serial_port = device.device_node or ''
@@ -118,6 +199,15 @@ class USBMonitor:
         
         # Post event to queue
         event_type = 'device_connected' if action == 'add' else 'device_disconnected'
-        self.event_queue.put((event_type, usb_device))
+        if action == 'add':
+            self.event_queue.put(('device', event_type, usb_device))
+        else:
+            # Removals only invalidate cached ports; never stall the udev
+            # thread for one while the main loop is busy flashing
+            try:
+                self.event_queue.put_nowait(('device', event_type, usb_device))
+            except Full:
+                logger.warning("[USB] Event queue full, dropped %s", event_type)
+                return
         
-        print(f"[USB] {event_type}: {usb_device}")
\ No newline at end of file
+        logger.info("[USB] %s: %s", event_type, usb_device)
\ No newline at end of file
@@ -1,35 +1,140 @@
 """USB Storage Monitor - Detect and mount USB storage devices."""
 
+import asyncio
+import ctypes
+import errno
+import logging
+import logging.handlers
 import os
-import time
-import subprocess
+import re
+import select
 import pyudev
-from queue import Queue
+from queue import Queue, SimpleQueue, Full
+from threading import Thread
 from dataclasses import dataclass
 
-@dataclass
+from src.compat import DATACLASS_SLOTS
+
+__all__ = ['USBStorage', 'USBStorageMonitor']
+
+logger = logging.getLogger(__name__)
+
+# libc handle for mount(2)/umount2(2), loaded on first use (False if unavailable)
+_libc = None
+
+def _load_libc():
+    """Load libc once with mount/umount2 prototypes.
+    
+    Returns:
+        ctypes.CDLL or None if unavailable
+    """
+    global _libc
+    
+    if _libc is None:
+        try:
+            # By soname: find_library() would fork ldconfig to look it up
+            libc = ctypes.CDLL('libc.so.6', use_errno=True)
+            libc.mount.argtypes = [ctypes.c_char_p] * 3 + [ctypes.c_ulong, ctypes.c_void_p]
+            libc.umount2.argtypes = [ctypes.c_char_p, ctypes.c_int]
+            _libc = libc
+        except (OSError, AttributeError):
+            _libc = False
+    
+    return _libc or None
+
+# Max wait for pending mount/unmount tasks on shutdown (seconds)
+SHUTDOWN_TIMEOUT = 5.0
+
+# Retry interval while the application queue is full (seconds)
+FORWARD_RETRY_DELAY = 0.05
+
+# Netlink receive buffer, large enough to ride out bursts of uevents
+MONITOR_RCVBUF_SIZE = 1024 * 1024
+
+# Octal escapes (\040 etc.) used for special characters in /proc/mounts
+_MOUNT_ESCAPE = re.compile(rb'\\([0-7]{3})')
+
+# Max partitions mounted at once by the startup scan
+SCAN_MOUNT_CONCURRENCY = 8
+
+# Filesystems tried, in order, when calling mount(2) directly and udev
+# did not report ID_FS_TYPE
+MOUNT_FS_TYPES = ('vfat', 'exfat', 'ntfs', 'ext4')
+
+# Filesystems without Unix permissions; ownership comes from mount options
+FOREIGN_FS_TYPES = ('vfat', 'exfat', 'ntfs')
+
+# Mount options that are mount(2) flags rather than filesystem data
+MOUNT_FLAGS = {
+    'rw': 0, 'ro': 1, 'nosuid': 2, 'nodev': 4, 'noexec': 8,
+    'noatime': 1024, 'nodiratime': 2048,
+}
+
+# mount(2) flags always set for (untrusted) USB media: MS_NOSUID|MS_NODEV|MS_NOEXEC
+UNTRUSTED_MOUNT_FLAGS = MOUNT_FLAGS['nosuid'] | MOUNT_FLAGS['nodev'] | MOUNT_FLAGS['noexec']
+
+# umount2(2) flag for a lazy unmount (umount -l)
+MNT_DETACH = 2
+
+# Max wait for udev to report a partition's filesystem (seconds)
+DEVICE_READY_TIMEOUT = 2.0
+
+# First re-check delay while waiting, doubled each time (seconds)
+DEVICE_READY_POLL = 0.02
+
+# Window (seconds) in which uevents for one device node are coalesced;
+# only the last action in it is handled
+EVENT_DEBOUNCE = 0.2
+
+@dataclass(**DATACLASS_SLOTS, frozen=True)
 class USBStorage:
     """USB storage device information."""
     device_node: str
     mount_point: str
     vendor: str
     model: str
-    
-    def __repr__(self):
-        return f"USBStorage(device={self.device_node}, mount={self.mount_point})"
 
 class USBStorageMonitor:
-    """Monitor for USB storage devices (flash drives)."""
+    """Monitor for USB storage devices (flash drives).
+    
+    Mounting and unmounting run as coroutines on the monitor's own asyncio
+    loop, so a slow stick never blocks the udev thread or other devices.
+    """
     
-    def __init__(self, event_queue, mount_base="/media/pi"):
+    __slots__ = (
+        'event_queue', 'mount_base', '_strict_usb_check',
+        '_log_handler', '_log_listener',
+        'context', 'monitor',
+        'loop', '_loop_thread', '_tasks', '_outbox',
+        '_usb_cache', '_action_dispatch', '_pending',
+        '_mounts', '_mounts_fd', '_mounts_epoll',
+    )
+    
+    def __init__(self, event_queue, mount_base="/media/pi", strict_usb_check=False):
         """Initialize USB storage monitor.
         
         Args:
             event_queue: Queue to post events
             mount_base: Base directory for mounting
+            strict_usb_check: Identify USB devices by walking udev parents
+                instead of matching the sysfs path
         """
         self.event_queue = event_queue
         self.mount_base = mount_base
+        self._strict_usb_check = strict_usb_check
+        
+        # Used standalone (nothing configured logging): write log records
+        # from a background listener so handlers never wait on stdout
+        self._log_handler = None
+        self._log_listener = None
+        if not logger.hasHandlers():
+            log_queue = SimpleQueue()
+            self._log_handler = logging.handlers.QueueHandler(log_queue)
+            self._log_listener = logging.handlers.QueueListener(log_queue, logging.StreamHandler())
+            logger.addHandler(self._log_handler)
+            if logger.level == logging.NOTSET:
+                logger.setLevel(logging.INFO)
+            self._log_listener.start()
         
         self.context = pyudev.Context()
         self.monitor = pyudev.Monitor.from_netlink(self.context)
@@ -37,138 +142,398 @@ class USBStorageMonitor:
         # Monitor block devices (storage)
         self.monitor.filter_by(subsystem='block', device_type='partition')
         
-        self.observer = None
+        try:
+            self.monitor.set_receive_buffer_size(MONITOR_RCVBUF_SIZE)
+        except Exception as e:
+            logger.info("[USBStorage] Could not enlarge receive buffer: %s", e)
+        
+        # Event loop running mount/unmount coroutines (started on demand)
+        self.loop = None
+        self._loop_thread = None
+        
+        # Strong references to running tasks (the loop only keeps weak ones)
+        self._tasks = set()
+        
+        # sys_path -> (device_node, vendor, model, sys_path) of known USB partitions
+        self._usb_cache = {}
+        
+        # udev action -> coroutine handling it; other actions are ignored
+        self._action_dispatch = {'add': self._on_add, 'remove': self._on_remove}
+        
+        # device_node -> asyncio.TimerHandle of its debounced uevent
+        self._pending = {}
+        
+        # Mount table cache: device node -> raw mount point (bytes). The kernel flags
+        # the mounts file with POLLPRI|POLLERR whenever the table changes;
+        # an epoll set watching it is what the loop waits on.
+        self._mounts = {}
+        self._mounts_fd = os.open('/proc/self/mounts', os.O_RDONLY)
+        self._mounts_epoll = select.epoll()
+        self._mounts_epoll.register(self._mounts_fd, select.EPOLLPRI | select.EPOLLERR)
+        self._reload_mounts()
         
         # Ensure mount base exists
         os.makedirs(mount_base, exist_ok=True)
         
-        print(f"[USBStorage] Monitor initialized, mount base: {mount_base}")
+        logger.info("[USBStorage] Monitor initialized, mount base: %s", mount_base)
     
     def start_monitoring(self):
         """Start monitoring USB storage devices."""
+        self._start_loop()
+        
+        # Hands events from the loop to the application queue, in order
+        self.loop.call_soon_threadsafe(self._spawn, self._forward_events())
+        
         # Scan for already-mounted USB devices
-        self._scan_existing_devices()
+        self.loop.call_soon_threadsafe(self._spawn, self._scan_existing_devices())
         
-        self.observer = pyudev.MonitorObserver(
-            self.monitor,
-            callback=self._handle_event,
-            name='usb-storage-monitor'
-        )
-        self.observer.start()
-        print("[USBStorage] Monitoring started")
+        # The loop watches the netlink socket itself; no observer thread
+        self.monitor.start()
+        self.loop.call_soon_threadsafe(self.loop.add_reader, self.monitor.fileno(), self._drain_monitor)
+        self.loop.call_soon_threadsafe(self.loop.add_reader, self._mounts_epoll.fileno(), self._on_mounts_changed)
+        logger.info("[USBStorage] Monitoring started")
+    
+    def _start_loop(self):
+        """Start the asyncio loop thread (no-op if already running)."""
+        if self._loop_thread and self._loop_thread.is_alive():
+            return
+        
+        self.loop = asyncio.new_event_loop()
+        self._loop_thread = Thread(target=self._run_loop, name='usb-storage', daemon=True)
+        self._loop_thread.start()
+    
+    def _run_loop(self):
+        """Run the event loop (runs in thread)."""
+        asyncio.set_event_loop(self.loop)
+        
+        # Events waiting for _forward_events (created on the loop's thread)
+        self._outbox = asyncio.Queue()
+        
+        self.loop.run_forever()
     
-    def _scan_existing_devices(self):
+    def _spawn(self, coro):
+        """Schedule coro as a task on the loop (call from the loop thread)."""
+        task = self.loop.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+    
+    def _post(self, event_type, data):
+        """Queue an event for the application (call from the loop thread)."""
+        self._outbox.put_nowait(('storage', event_type, data))
+    
+    async def _forward_events(self):
+        """Move events from the outbox to the application queue.
+        
+        A full application queue (main loop busy flashing) is retried
+        every FORWARD_RETRY_DELAY. No thread ever blocks in put(), so
+        cancelling this task on shutdown really stops it.
+        """
+        while True:
+            event = await self._outbox.get()
+            while True:
+                try:
+                    self.event_queue.put_nowait(event)
+                    break
+                except Full:
+                    await asyncio.sleep(FORWARD_RETRY_DELAY)
+    
+    async def _scan_existing_devices(self):
         """Scan for USB devices that are already plugged in."""
-        print("[USBStorage] Scanning for existing USB devices...")
+        logger.info("[USBStorage] Scanning for existing USB devices...")
         
         try:
-            # List all block devices
-            for device in self.context.list_devices(subsystem='block', DEVTYPE='partition'):
-                # Check if it's a USB device
-                if not self._is_usb_device(device):
-                    continue
-                
-                device_node = device.device_node
-                
-                # Check if already mounted
-                existing_mount = self._get_existing_mount(device_node)
-                
-                if existing_mount:
-                    print(f"[USBStorage] Found existing USB: {device_node} at {existing_mount}")
-                    
-                    vendor = device.get('ID_VENDOR', 'Unknown')
-                    model = device.get('ID_MODEL', 'Unknown')
-                    
-                    storage = USBStorage(
-                        device_node=device_node,
-                        mount_point=existing_mount,
-                        vendor=vendor,
-                        model=model
-                    )
-                    
-                    # Post event
-                    self.event_queue.put(('usb_storage_mounted', storage))
-                else:
-                    print(f"[USBStorage] Found unmounted USB: {device_node}")
-                    # Try to mount it
-                    storage = self._mount_device(device)
-                    if storage:
-                        self.event_queue.put(('usb_storage_mounted', storage))
-        
+            partitions = self._enumerate_usb_partitions()
         except Exception as e:
-            print(f"[USBStorage] Error scanning devices: {e}")
+            logger.error("[USBStorage] Error scanning devices: %s", e)
+            return
+        
+        # Partitions are independent: mount them concurrently (bounded)
+        limit = asyncio.Semaphore(SCAN_MOUNT_CONCURRENCY)
+        results = await asyncio.gather(
+            *(self._mount_or_report(entry, limit) for entry in partitions),
+            return_exceptions=True
+        )
+        
+        for result in results:
+            if isinstance(result, Exception):
+                logger.error("[USBStorage] Error scanning devices: %s", result)
+    
+    async def _mount_or_report(self, entry, limit):
+        """Report an already-mounted partition, or mount it.
+        
+        Args:
+            entry: (device_node, vendor, model, sys_path) tuple
+            limit: Semaphore bounding concurrent mounts
+        """
+        device_node, vendor, model, sys_path = entry
+        
+        # Check if already mounted
+        existing_mount = self._get_existing_mount(device_node)
+        
+        if existing_mount:
+            logger.info("[USBStorage] Found existing USB: %s at %s", device_node, existing_mount)
+            
+            storage = USBStorage(
+                device_node=device_node,
+                mount_point=existing_mount,
+                vendor=vendor,
+                model=model
+            )
+            
+            # Post event
+            self._post('usb_storage_mounted', storage)
+        else:
+            logger.info("[USBStorage] Found unmounted USB: %s", device_node)
+            # Try to mount it
+            async with limit:
+                device = pyudev.Devices.from_sys_path(self.context, sys_path)
+                storage = await self._mount_device(device)
+            if storage:
+                self._post('usb_storage_mounted', storage)
+    
+    def _enumerate_usb_partitions(self):
+        """List USB partitions with one udev enumeration.
+        
+        Results are remembered in _usb_cache.
+        
+        Returns:
+            List of (device_node, vendor, model, sys_path) tuples
+        """
+        partitions = []
+        for device in self.context.list_devices(subsystem='block', DEVTYPE='partition'):
+            if not self._is_usb_device(device):
+                continue
+            
+            sys_path = device.sys_path
+            
+            entry = (
+                device.device_node,
+                device.get('ID_VENDOR', 'Unknown'),
+                device.get('ID_MODEL', 'Unknown'),
+                sys_path
+            )
+            self._usb_cache[sys_path] = entry
+            partitions.append(entry)
+        
+        return partitions
     
     def stop_monitoring(self):
         """Stop monitoring."""
-        if self.observer:
-            self.observer.stop()
-            self.observer = None
-        print("[USBStorage] Monitoring stopped")
+        if self._loop_thread and self._loop_thread.is_alive():
+            try:
+                future = asyncio.run_coroutine_threadsafe(self._cancel_tasks(), self.loop)
+                future.result(timeout=SHUTDOWN_TIMEOUT)
+            except Exception as e:
+                logger.error("[USBStorage] Error cancelling tasks: %s", e)
+            
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self._loop_thread.join(timeout=SHUTDOWN_TIMEOUT)
+            self._loop_thread = None
+        logger.info("[USBStorage] Monitoring stopped")
+        
+        if self._log_listener:
+            # Flushes queued records; later ones go to the default handler
+            self._log_listener.stop()
+            logger.removeHandler(self._log_handler)
+            self._log_listener = None
     
-    def _handle_event(self, device):
-        """Handle USB storage event.
+    async def _cancel_tasks(self):
+        """Stop reading udev, cancel running tasks and wait for them."""
+        self.loop.remove_reader(self.monitor.fileno())
+        self.loop.remove_reader(self._mounts_epoll.fileno())
+        
+        for handle in self._pending.values():
+            handle.cancel()
+        self._pending.clear()
+        
+        tasks = list(self._tasks)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        
+        # Join the to_thread() workers; left running, they block interpreter exit
+        await self.loop.shutdown_default_executor()
+    
+    def _drain_monitor(self):
+        """Handle every queued uevent (loop reader callback)."""
+        while True:
+            device = self.monitor.poll(timeout=0)
+            if device is None:
+                break
+            if device.action not in self._action_dispatch:
+                continue
+            
+            # A newer uevent for the same node supersedes a pending one
+            handle = self._pending.pop(device.device_node, None)
+            if handle:
+                handle.cancel()
+            self._pending[device.device_node] = self.loop.call_later(
+                EVENT_DEBOUNCE, self._dispatch, device
+            )
+    
+    def _dispatch(self, device):
+        """Handle a uevent once its debounce window has passed.
         
         Args:
             device: pyudev device object
         """
-        action = device.action
+        self._pending.pop(device.device_node, None)
+        self._spawn(self._handle_event_async(device))
+    
+    async def _handle_event_async(self, device):
+        """Handle USB storage event.
         
-        if action not in ('add', 'remove'):
+        Args:
+            device: pyudev device object
+        """
+        handler = self._action_dispatch.get(device.action)
+        if handler is None:
             return
         
-        # Check if it's a USB device
-        if not self._is_usb_device(device):
+        # Check if it's a USB device (known ones skip the sysfs walk; on
+        # removal the sysfs parents may already be gone)
+        if device.sys_path not in self._usb_cache and not self._is_usb_device(device):
             return
         
+        await handler(device)
+    
+    async def _on_add(self, device):
+        """Remember and mount a newly added USB partition.
+        
+        Args:
+            device: pyudev device object
+        """
         device_node = device.device_node
+        sys_path = device.sys_path
         
-        if action == 'add':
-            print(f"\n[USBStorage] USB storage detected: {device_node}")
-            
-            # Try to mount
-            storage = self._mount_device(device)
-            
-            if storage:
-                print(f"[USBStorage] ✓ Mounted at: {storage.mount_point}")
-                self.event_queue.put(('usb_storage_mounted', storage))
-            else:
-                print(f"[USBStorage] ✗ Failed to mount")
+        self._usb_cache[sys_path] = (
+            device_node,
+            device.get('ID_VENDOR', 'Unknown'),
+            device.get('ID_MODEL', 'Unknown'),
+            sys_path
+        )
         
-        elif action == 'remove':
-            print(f"\n[USBStorage] USB storage removed: {device_node}")
-            self.event_queue.put(('usb_storage_removed', device_node))
+        logger.info("\n[USBStorage] USB storage detected: %s", device_node)
+        
+        # Try to mount
+        storage = await self._mount_device(device)
+        
+        if storage:
+            logger.info("[USBStorage] ✓ Mounted at: %s", storage.mount_point)
+            self._post('usb_storage_mounted', storage)
+        else:
+            logger.info("[USBStorage] ✗ Failed to mount")
+    
+    async def _on_remove(self, device):
+        """Forget a removed USB partition and report it.
+        
+        Args:
+            device: pyudev device object
+        """
+        device_node = device.device_node
+        
+        logger.info("\n[USBStorage] USB storage removed: %s", device_node)
+        self._usb_cache.pop(device.sys_path, None)
+        self._post('usb_storage_removed', device_node)
     
     def _is_usb_device(self, device):
         """Check if device is a USB storage device.
         
         Args:
             device: pyudev device
-            
+        
         Returns:
             True if USB device
         """
-        # Find parent USB device
-        parent = device.find_parent('usb', 'usb_device')
-        return parent is not None
+        if self._strict_usb_check:
+            # Find parent USB device
+            parent = device.find_parent('usb', 'usb_device')
+            return parent is not None
+        
+        # The bus shows up in the sysfs path (.../usb1/1-1/...): no syscalls
+        sys_path = device.sys_path
+        return '/usb' in sys_path and '/block/' in sys_path
     
-    def _mount_device(self, device):
-        """Mount USB storage device.
+    async def _run_command(self, args, timeout):
+        """Run a command without blocking the loop.
+        
+        Args:
+            args: Command and arguments
+            timeout: Max seconds to wait
+        
+        Returns:
+            (returncode, stderr text)
+        
+        Raises:
+            asyncio.TimeoutError: Command did not finish in time (it is killed)
+        """
+        proc = await asyncio.create_subprocess_exec(
+            *args,
+            stdout=asyncio.subprocess.DEVNULL,
+            stderr=asyncio.subprocess.PIPE
+        )
+        
+        try:
+            _, stderr = await asyncio.wait_for(proc.communicate(), timeout)
+        except asyncio.TimeoutError:
+            proc.kill()
+            await proc.wait()
+            raise
+        
+        return proc.returncode, stderr.decode(errors='replace')
+    
+    async def _wait_ready(self, device, timeout=DEVICE_READY_TIMEOUT):
+        """Wait until udev has probed the partition's filesystem.
+        
+        Usually ID_FS_USAGE/ID_FS_TYPE are already in the event and this
+        returns at once; otherwise the device is re-read with backoff.
         
         Args:
             device: pyudev device
+            timeout: Max seconds to wait
             
+        Returns:
+            pyudev device, refreshed if it had to be re-read
+        """
+        deadline = self.loop.time() + timeout
+        delay = DEVICE_READY_POLL
+        
+        while not (device.get('ID_FS_USAGE') and device.get('ID_FS_TYPE')):
+            remaining = deadline - self.loop.time()
+            if remaining <= 0:
+                logger.info("[USBStorage] No filesystem reported for %s, mounting anyway", device.device_node)
+                break
+            
+            await asyncio.sleep(min(delay, remaining))
+            delay *= 2
+            
+            try:
+                device = pyudev.Devices.from_device_node(self.context, device.device_node)
+            except Exception:
+                # Can't re-read it; settle for the old fixed wait
+                await asyncio.sleep(1)
+                break
+        
+        return device
+    
+    async def _mount_device(self, device):
+        """Mount USB storage device.
+        
+        Args:
+            device: pyudev device
+        
         Returns:
             USBStorage object or None
         """
         device_node = device.device_node
         
         # Wait for device to be ready
-        time.sleep(1)
+        device = await self._wait_ready(device)
         
         # Check if already mounted
         existing_mount = self._get_existing_mount(device_node)
         if existing_mount:
-            print(f"[USBStorage] Already mounted at: {existing_mount}")
+            logger.info("[USBStorage] Already mounted at: %s", existing_mount)
             
             vendor = device.get('ID_VENDOR', 'Unknown')
             model = device.get('ID_MODEL', 'Unknown')
@@ -185,39 +550,44 @@ class USBStorageMonitor:
         mount_point = os.path.join(self.mount_base, mount_name)
         
         try:
-            # Force unmount first (cleanup stale mounts)
-            subprocess.run(
-                ['sudo', 'umount', '-l', device_node],
-                capture_output=True,
-                timeout=5
-            )
+            # Fresh mount directory; VFS calls can stall on a flaky stick,
+            # so keep them off the loop
+            await asyncio.to_thread(self._reset_mount_point, mount_point)
             
-            # Remove old mount point
-            try:
-                os.rmdir(mount_point)
-            except:
-                pass
+            logger.info("[USBStorage] Mounting %s to %s...", device_node, mount_point)
             
-            # Create fresh mount directory
-            os.makedirs(mount_point, exist_ok=True)
+            # udev already probed the filesystem; saves the kernel trying each
+            fs_type = device.get('ID_FS_TYPE')
+            
+            # Single mount(2) call when running with enough privileges
+            if await asyncio.to_thread(self._mount_direct, device_node, mount_point, fs_type):
+                logger.info("[USBStorage] ✓ Mounted successfully")
+                
+                return USBStorage(
+                    device_node=device_node,
+                    mount_point=mount_point,
+                    vendor=device.get('ID_VENDOR', 'Unknown'),
+                    model=device.get('ID_MODEL', 'Unknown')
+                )
+            
+            # Otherwise go through sudo mount(8)
+            # Force unmount first (cleanup stale mounts)
+            await self._run_command(['sudo', 'umount', '-l', device_node], timeout=5)
             
             # Try to mount with retry
-            print(f"[USBStorage] Mounting {device_node} to {mount_point}...")
+            command = ['sudo', 'mount', '-o', self._mount_opts_for(fs_type), device_node, mount_point]
+            if fs_type:
+                command[2:2] = ['-t', fs_type]
             
             for attempt in range(3):
-                result = subprocess.run(
-                    ['sudo', 'mount', '-o', 'rw,user,umask=000', device_node, mount_point],
-                    capture_output=True,
-                    text=True,
-                    timeout=10
-                )
+                returncode, stderr = await self._run_command(command, timeout=10)
                 
-                if result.returncode == 0:
+                if returncode == 0:
                     # Get device info
                     vendor = device.get('ID_VENDOR', 'Unknown')
                     model = device.get('ID_MODEL', 'Unknown')
                     
-                    print(f"[USBStorage] ✓ Mounted successfully")
+                    logger.info("[USBStorage] ✓ Mounted successfully")
                     
                     return USBStorage(
                         device_node=device_node,
@@ -227,81 +597,214 @@ class USBStorageMonitor:
                     )
                 else:
                     if attempt < 2:
-                        print(f"[USBStorage] Mount failed (attempt {attempt+1}/3), retrying...")
-                        time.sleep(1)
+                        logger.info("[USBStorage] Mount failed (attempt %s/3), retrying...", attempt+1)
+                        await asyncio.sleep(1)
                     else:
-                        print(f"[USBStorage] Mount failed: {result.stderr}")
+                        logger.info("[USBStorage] Mount failed: %s", stderr)
                         return None
-                
-        except subprocess.TimeoutExpired:
-            print(f"[USBStorage] Mount timeout")
+        
+        except asyncio.TimeoutError:
+            logger.info("[USBStorage] Mount timeout")
             return None
         except Exception as e:
-            print(f"[USBStorage] Mount error: {e}")
+            logger.error("[USBStorage] Mount error: %s", e)
             return None
     
+    def _reset_mount_point(self, mount_point):
+        """Replace mount_point with an empty directory (runs in a worker)."""
+        # Remove old mount point
+        try:
+            os.rmdir(mount_point)
+        except:
+            pass
+        
+        # Create fresh mount directory
+        os.makedirs(mount_point, exist_ok=True)
+    
+    def _mount_opts_for(self, fs_type):
+        """Pick mount options for a filesystem type.
+        
+        Args:
+            fs_type: Filesystem type, or None if unknown
+            
+        Returns:
+            Options string as for mount -o
+        """
+        # Sticks are untrusted: never honour setuid bits, device nodes or
+        # executables on them (mount(8)'s `user` implied the same)
+        safe = 'nosuid,nodev,noexec'
+        
+        if fs_type in FOREIGN_FS_TYPES:
+            return f'rw,{safe},umask=000,uid=1000,gid=1000'
+        if fs_type and (fs_type.startswith('ext') or fs_type == 'btrfs'):
+            # Skip access-time inode writes on flash
+            return f'rw,{safe},noatime,nodiratime'
+        if fs_type is None:
+            # Unknown until mount probes it; most sticks are FAT
+            return f'rw,{safe},umask=000'
+        return f'rw,{safe}'
+    
+    def _split_mount_opts(self, opts):
+        """Split a mount -o string into mount(2) flags and data.
+        
+        Args:
+            opts: Comma-separated options
+            
+        Returns:
+            (flags, data bytes or None)
+        """
+        flags = 0
+        data = []
+        for opt in opts.split(','):
+            if opt in MOUNT_FLAGS:
+                flags |= MOUNT_FLAGS[opt]
+            else:
+                data.append(opt)
+        return flags, ','.join(data).encode() or None
+    
+    def _mount_direct(self, device_node, mount_point, fs_type=None):
+        """Mount with the mount(2) syscall.
+        
+        Args:
+            device_node: Device node path
+            mount_point: Existing directory to mount on
+            fs_type: Filesystem type from udev; each of MOUNT_FS_TYPES is
+                tried if None
+            
+        Returns:
+            True if mounted, False to fall back to sudo mount
+        """
+        libc = _load_libc()
+        if libc is None:
+            return False
+        
+        for fs_type in ((fs_type,) if fs_type else MOUNT_FS_TYPES):
+            flags, data = self._split_mount_opts(self._mount_opts_for(fs_type))
+            flags |= UNTRUSTED_MOUNT_FLAGS
+            if libc.mount(device_node.encode(), mount_point.encode(), fs_type.encode(),
+                          flags, data) == 0:
+                return True
+            
+            err = ctypes.get_errno()
+            if err not in (errno.EINVAL, errno.ENODEV):
+                # EPERM and anything else: let mount(8) handle it
+                if err not in (errno.EPERM, errno.EACCES):
+                    logger.info("[USBStorage] mount(2) failed: %s", os.strerror(err))
+                return False
+        
+        return False
+    
+    def _umount_direct(self, mount_point):
+        """Lazily unmount with the umount2(2) syscall.
+        
+        Args:
+            mount_point: Mount point path
+            
+        Returns:
+            True if unmounted, False to fall back to sudo umount
+        """
+        libc = _load_libc()
+        if libc is None:
+            return False
+        
+        return libc.umount2(mount_point.encode(), MNT_DETACH) == 0
+    
     def _get_existing_mount(self, device_node):
         """Check if device is already mounted.
         
         Args:
             device_node: Device node path (e.g., /dev/sda1)
-            
+        
         Returns:
             Mount point path or None
         """
-        try:
-            # Read /proc/mounts
-            with open('/proc/mounts', 'r') as f:
-                for line in f:
-                    parts = line.split()
-                    if len(parts) >= 2 and parts[0] == device_node:
-                        return parts[1]
+        raw = self._mounts.get(os.fsencode(device_node))
+        if raw is None:
             return None
+        
+        # Unescape only the one mount point actually asked for
+        if b'\\' in raw:
+            raw = _MOUNT_ESCAPE.sub(lambda m: bytes([int(m.group(1), 8)]), raw)
+        return os.fsdecode(raw)
+    
+    def _on_mounts_changed(self):
+        """Reload the mount table after the kernel signalled a change."""
+        # Consume the notification, else the epoll fd stays readable
+        self._mounts_epoll.poll(0)
+        self._reload_mounts()
+    
+    def _reload_mounts(self):
+        """Re-read the mount table into self._mounts (first mount wins)."""
+        try:
+            # The mounts file is a procfs seq_file: it reports size 0 and
+            # cannot be mmap()ed, so it is read, from the fd kept open
+            os.lseek(self._mounts_fd, 0, os.SEEK_SET)
+            chunks = []
+            while chunk := os.read(self._mounts_fd, 65536):
+                chunks.append(chunk)
+            
+            # Only the first two fields are needed; no decode, no full split
+            mounts = {}
+            for line in b''.join(chunks).split(b'\n'):
+                dev, _, rest = line.partition(b' ')
+                if rest:
+                    mounts.setdefault(dev, rest.partition(b' ')[0])
+            self._mounts = mounts
         except Exception as e:
-            print(f"[USBStorage] Error checking mounts: {e}")
-            return None
+            logger.error("[USBStorage] Error checking mounts: %s", e)
     
     def unmount_device(self, mount_point):
+        """Unmount USB storage device (blocks until done).
+        
+        Runs on the monitor loop while it is up, otherwise on a temporary one.
+        
+        Args:
+            mount_point: Mount point path
+        
+        Returns:
+            True if successful
+        """
+        coro = self.unmount_device_async(mount_point)
+        
+        if self._loop_thread and self._loop_thread.is_alive():
+            return asyncio.run_coroutine_threadsafe(coro, self.loop).result()
+        return asyncio.run(coro)
+    
+    async def unmount_device_async(self, mount_point):
         """Unmount USB storage device.
         
         Args:
             mount_point: Mount point path
-            
+        
         Returns:
             True if successful
         """
         try:
-            print(f"[USBStorage] Unmounting {mount_point}...")
+            logger.info("[USBStorage] Unmounting %s...", mount_point)
             
-            # Force unmount with lazy option
-            result = subprocess.run(
-                ['sudo', 'umount', '-l', mount_point],
-                capture_output=True,
-                text=True,
-                timeout=10
-            )
+            if await asyncio.to_thread(self._umount_direct, mount_point):
+                returncode = 0
+            else:
+                # Force unmount with lazy option
+                returncode, _ = await self._run_command(['sudo', 'umount', '-l', mount_point], timeout=10)
             
-            if result.returncode == 0:
-                print(f"[USBStorage] ✓ Unmounted")
+            if returncode == 0:
+                logger.info("[USBStorage] ✓ Unmounted")
             else:
                 # Try force unmount
-                print(f"[USBStorage] Trying force unmount...")
-                subprocess.run(
-                    ['sudo', 'umount', '-f', mount_point],
-                    capture_output=True,
-                    timeout=5
-                )
+                logger.info("[USBStorage] Trying force unmount...")
+                await self._run_command(['sudo', 'umount', '-f', mount_point], timeout=5)
             
             # Remove mount directory
             try:
-                time.sleep(0.5)
-                os.rmdir(mount_point)
-                print(f"[USBStorage] ✓ Removed mount point")
+                await asyncio.sleep(0.5)
+                await asyncio.to_thread(os.rmdir, mount_point)
+                logger.info("[USBStorage] ✓ Removed mount point")
             except OSError as e:
-                print(f"[USBStorage] Could not remove mount point: {e}")
+                logger.info("[USBStorage] Could not remove mount point: %s", e)
             
             return True
-                
+        
         except Exception as e:
-            print(f"[USBStorage] Unmount error: {e}")
+            logger.error("[USBStorage] Unmount error: %s", e)
             return False
\ No newline at end of file
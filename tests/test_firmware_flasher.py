@@ -0,0 +1,131 @@
+"""Tests for FirmwareFlasher circuit breaker and retry backoff."""
+
+import time
+
+import pytest
+
+from src import firmware_flasher
+from src.firmware_flasher import FirmwareFlasher, FlashResult
+
+
+class FakeClock:
+    """Monotonic clock advanced by hand."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(time, 'monotonic', clock)
+    return clock
+
+
+def make_flasher(**firmware):
+    config = {
+        'firmware': {
+            'command': 'esptool.py --port {port} write_flash 0x10000 {firmware}',
+            'timeout': 60,
+            'baudrate': 921600,
+            'retry_count': 3,
+            'retry_delay': 3,
+            'retry_base_delay': 1,
+            'retry_max_delay': 30,
+            'retry_jitter': 0.5,
+            **firmware,
+        }
+    }
+    return FirmwareFlasher(config)
+
+
+def fail_every_flash(flasher):
+    """Replace the retry loop with one that always fails; returns call log."""
+    calls = []
+
+    def flash_with_retry(device_port):
+        calls.append(device_port)
+        return FlashResult(success=False, message='boom', duration=0.0)
+
+    flasher._flash_with_retry = flash_with_retry
+    return calls
+
+
+def test_breaker_opens_after_threshold_failures_in_window(clock):
+    flasher = make_flasher()
+    calls = fail_every_flash(flasher)
+
+    for _ in range(firmware_flasher.BREAKER_THRESHOLD):
+        clock.now += 1
+        assert not flasher.flash('/dev/ttyUSB0').success
+
+    result = flasher.flash('/dev/ttyUSB0')
+
+    assert result.attempt == 0
+    assert 'Circuit open' in result.message
+    assert len(calls) == firmware_flasher.BREAKER_THRESHOLD
+
+
+def test_breaker_stays_closed_when_failures_are_spread_out(clock):
+    flasher = make_flasher()
+    calls = fail_every_flash(flasher)
+
+    for _ in range(firmware_flasher.BREAKER_THRESHOLD + 1):
+        clock.now += firmware_flasher.BREAKER_WINDOW
+        flasher.flash('/dev/ttyUSB0')
+
+    assert len(calls) == firmware_flasher.BREAKER_THRESHOLD + 1
+
+
+def test_breaker_closes_after_cooldown(clock):
+    flasher = make_flasher()
+    calls = fail_every_flash(flasher)
+
+    for _ in range(firmware_flasher.BREAKER_THRESHOLD):
+        flasher.flash('/dev/ttyUSB0')
+
+    clock.now += firmware_flasher.BREAKER_COOLDOWN - 1
+    assert flasher.flash('/dev/ttyUSB0').attempt == 0
+
+    clock.now += 1
+    flasher.flash('/dev/ttyUSB0')
+    assert len(calls) == firmware_flasher.BREAKER_THRESHOLD + 1
+
+
+def test_success_resets_failure_count(clock):
+    flasher = make_flasher()
+    outcomes = iter([False, False, True, False, False])
+
+    def flash_with_retry(device_port):
+        return FlashResult(success=next(outcomes), message='', duration=0.0)
+
+    flasher._flash_with_retry = flash_with_retry
+
+    for _ in range(5):
+        result = flasher.flash('/dev/ttyUSB0')
+
+    # Only two failures since the success: circuit still closed
+    assert result.attempt != 0
+    assert len(flasher._recent_failures) == 2
+
+
+def test_backoff_doubles_and_caps_without_jitter():
+    flasher = make_flasher(retry_base_delay=1, retry_max_delay=5, retry_jitter=0)
+
+    delays = [flasher._backoff_delay(attempt) for attempt in range(1, 6)]
+
+    assert delays == [1, 2, 4, 5, 5]
+
+
+def test_backoff_jitter_stays_within_bounds():
+    flasher = make_flasher(retry_base_delay=2, retry_max_delay=30, retry_jitter=0.5)
+    flasher._rng.seed(1234)
+
+    for attempt in range(1, 8):
+        nominal = min(30, 2 * 2 ** (attempt - 1))
+        for _ in range(200):
+            delay = flasher._backoff_delay(attempt)
+            assert nominal * 0.5 <= delay <= nominal * 1.5
@@ -0,0 +1,40 @@
+"""Tests for main event batching."""
+
+from queue import Queue
+
+from src.main import collect_events
+from src.usb_monitor import USBDevice
+
+
+def connected(sys_name, vid=0x1a86, pid=0x7523):
+    return ('device', 'device_connected', USBDevice(sys_name, '/dev/ttyUSB0', vid, pid))
+
+
+def test_interface_events_collapse_into_their_device():
+    event_queue = Queue()
+    first = connected('1-1')
+    # As in main(): the first event was already taken off the queue
+    event_queue.put(first)
+    event_queue.get()
+    for event in (connected('1-1:1.0'), connected('1-1:1.1')):
+        event_queue.put(event)
+
+    batch = collect_events(event_queue, first)
+
+    assert batch == [first]
+    # Dropped duplicates are marked done; only the returned one is pending
+    assert event_queue.unfinished_tasks == 1
+
+
+def test_distinct_devices_and_other_events_are_kept():
+    event_queue = Queue()
+    first = connected('1-1')
+    others = [
+        connected('1-2'),
+        ('device', 'device_disconnected', USBDevice('1-3', '', 0x1a86, 0x7523)),
+        ('storage', 'usb_storage_removed', '/dev/sda1'),
+    ]
+    for event in others:
+        event_queue.put(event)
+
+    assert collect_events(event_queue, first) == [first] + others
@@ -0,0 +1,96 @@
+"""Tests for USBStorageMonitor mount table parsing and mount options."""
+
+import os
+
+import pytest
+
+from src.usb_storage_monitor import MOUNT_FLAGS, UNTRUSTED_MOUNT_FLAGS, USBStorageMonitor
+
+MOUNTS = (
+    b"proc /proc proc rw,nosuid,nodev,noexec,relatime 0 0\n"
+    b"/dev/mmcblk0p2 / ext4 rw,noatime 0 0\n"
+    b"/dev/sda1 /media/pi/MY\\040STICK vfat rw,nosuid,nodev 0 0\n"
+    b"/dev/sda1 /mnt/again vfat rw 0 0\n"
+    b"/dev/sdb1 /media/pi/sdb1 ext4 rw 0 0\n"
+)
+
+
+@pytest.fixture
+def monitor(tmp_path):
+    """Monitor reading its mount table from a plain file (no udev needed)."""
+    mounts_file = tmp_path / 'mounts'
+    mounts_file.write_bytes(MOUNTS)
+
+    monitor = object.__new__(USBStorageMonitor)
+    monitor._mounts = {}
+    monitor._mounts_fd = os.open(mounts_file, os.O_RDONLY)
+    monitor._reload_mounts()
+
+    yield monitor, mounts_file
+
+    os.close(monitor._mounts_fd)
+
+
+def test_existing_mount_found(monitor):
+    monitor, _ = monitor
+
+    assert monitor._get_existing_mount('/dev/sdb1') == '/media/pi/sdb1'
+
+
+def test_unknown_device_not_mounted(monitor):
+    monitor, _ = monitor
+
+    assert monitor._get_existing_mount('/dev/sdc1') is None
+
+
+def test_octal_escapes_are_unescaped(monitor):
+    monitor, _ = monitor
+
+    # First mount of a device wins; its \040 is a space
+    assert monitor._get_existing_mount('/dev/sda1') == '/media/pi/MY STICK'
+
+
+def test_reload_picks_up_changes(monitor):
+    monitor, mounts_file = monitor
+
+    mounts_file.write_bytes(b"/dev/sdc1 /media/pi/sdc1 vfat rw 0 0\n")
+    monitor._reload_mounts()
+
+    assert monitor._get_existing_mount('/dev/sdc1') == '/media/pi/sdc1'
+    assert monitor._get_existing_mount('/dev/sdb1') is None
+
+
+def test_reload_reads_tables_larger_than_one_read(monitor):
+    monitor, mounts_file = monitor
+
+    lines = [b"/dev/loop%d /snap/pkg/%d squashfs ro 0 0\n" % (i, i) for i in range(3000)]
+    mounts_file.write_bytes(b''.join(lines) + b"/dev/sdd1 /media/pi/sdd1 vfat rw 0 0\n")
+    monitor._reload_mounts()
+
+    assert monitor._get_existing_mount('/dev/sdd1') == '/media/pi/sdd1'
+    assert len(monitor._mounts) == 3001
+
+
+def test_split_mount_opts_separates_flags_from_data():
+    monitor = object.__new__(USBStorageMonitor)
+
+    flags, data = monitor._split_mount_opts('rw,nosuid,nodev,noexec,noatime,umask=000,uid=1000')
+
+    assert flags == UNTRUSTED_MOUNT_FLAGS | MOUNT_FLAGS['noatime']
+    assert data == b'umask=000,uid=1000'
+
+
+def test_split_mount_opts_without_data():
+    monitor = object.__new__(USBStorageMonitor)
+
+    assert monitor._split_mount_opts('ro,nosuid') == (MOUNT_FLAGS['ro'] | MOUNT_FLAGS['nosuid'], None)
+
+
+@pytest.mark.parametrize('fs_type', ['vfat', 'exfat', 'ntfs', 'ext4', 'btrfs', 'xfs', None])
+def test_mount_opts_never_trust_the_stick(fs_type):
+    monitor = object.__new__(USBStorageMonitor)
+
+    opts = monitor._mount_opts_for(fs_type).split(',')
+
+    assert {'nosuid', 'nodev', 'noexec'} <= set(opts)
+    assert 'user' not in opts